@@ -10,6 +10,7 @@ or selective imports when needed.
 from . import config
 from . import database
 from . import telethon_handler
+from . import campaigns
 from . import handlers
 from . import keyboards
 
@@ -20,6 +21,7 @@ from .encryption import encrypt_data, decrypt_data
 from .config import *
 from .database import *
 from .telethon_handler import *
+from .campaigns import *
 from .handlers import *
 from .keyboards import *
 
@@ -29,6 +31,7 @@ __all__ = [
     "config",
     "database",
     "telethon_handler",
+    "campaigns",
     "handlers",
     "keyboards",
 
@@ -0,0 +1,350 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+from PyToday import config, database, telethon_handler
+
+logger = logging.getLogger(__name__)
+
+SLOT_TOLERANCE = 0.25
+
+_heap = []
+_stale_entries = 0
+_sequence = itertools.count()
+_campaigns = {}
+_starting = set()
+_wakeup = None
+_scheduler_task = None
+
+def _push(due, kind, campaign, account_id, chat_key=None):
+    sequence = next(_sequence)
+    heapq.heappush(_heap, (due, sequence, kind, campaign, account_id, chat_key))
+    if _heap[0][1] == sequence and _wakeup is not None:
+        _wakeup.set()
+    return sequence
+
+def _schedule(due, kind, campaign, account_id, chat_key):
+    campaign["accounts"][account_id]["entries"][chat_key] = _push(due, kind, campaign, account_id, chat_key)
+
+def _discard_stale_entries():
+    global _stale_entries
+    _heap[:] = [entry for entry in _heap if entry[3]["active"]]
+    heapq.heapify(_heap)
+    _stale_entries = 0
+
+def _start_scheduler():
+    global _wakeup, _scheduler_task
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = asyncio.create_task(_scheduler_loop())
+
+async def _scheduler_loop():
+    global _stale_entries
+    while True:
+        if not _heap:
+            _wakeup.clear()
+            await _wakeup.wait()
+            continue
+        
+        due = _heap[0][0]
+        delay = due - time.monotonic()
+        if delay > 0:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        due, sequence, kind, campaign, account_id, chat_key = heapq.heappop(_heap)
+        if not campaign["active"]:
+            _stale_entries = max(_stale_entries - 1, 0)
+            continue
+        
+        try:
+            if kind == "refresh":
+                _spawn(campaign, _refresh_account(campaign, account_id))
+            else:
+                _dispatch(due, sequence, kind, campaign, account_id, chat_key)
+        except Exception as e:
+            logger.error(f"Campaign scheduler error for user {campaign['user_id']}: {e}")
+
+def _spawn(campaign, coro):
+    task = asyncio.create_task(coro)
+    campaign["tasks"].add(task)
+    task.add_done_callback(campaign["tasks"].discard)
+
+def _dispatch(due, sequence, kind, campaign, account_id, chat_key):
+    account = campaign["accounts"][account_id]
+    chat = account["chats"].get(chat_key)
+    if chat is None or account["entries"].get(chat_key) != sequence:
+        return
+    
+    now = time.monotonic()
+    parked = telethon_handler.get_send_delay(account_id, chat[0])
+    if parked > 0:
+        deadline = now + parked
+        if deadline > account["parked_until"]:
+            telethon_handler.record_send_wait(account_id, deadline - max(account["parked_until"], now))
+            account["parked_until"] = deadline
+        _schedule(deadline, "send", campaign, account_id, chat_key)
+        return
+    
+    if account["sending"]:
+        _schedule(max(account["next_slot"], now + campaign["interval"]), "send", campaign, account_id, chat_key)
+        return
+    
+    if kind == "send":
+        if account["next_slot"] > now:
+            _schedule(account["next_slot"], "reserved", campaign, account_id, chat_key)
+            account["next_slot"] += campaign["interval"]
+            return
+        slot = account["next_slot"] if now - account["next_slot"] < SLOT_TOLERANCE else now
+        account["next_slot"] = slot + campaign["interval"]
+    campaign["current_account"] = account_id
+    account["position"] += 1
+    _schedule(due + len(account["chats"]) * campaign["interval"], "send", campaign, account_id, chat_key)
+    account["sending"] = True
+    _spawn(campaign, _send(campaign, account_id, chat_key, chat))
+
+async def _send(campaign, account_id, chat_key, chat):
+    account = campaign["accounts"][account_id]
+    chat_id, access_hash = chat
+    try:
+        if campaign["use_forward"]:
+            result = await telethon_handler.forward_from_saved_messages(account_id, chat_id, access_hash)
+        else:
+            result = await telethon_handler.send_message_to_chat(account_id, chat_id, campaign["ad_text"], access_hash, media=campaign["media"])
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    finally:
+        account["sending"] = False
+        now = time.monotonic()
+        if now > account["next_slot"]:
+            account["next_slot"] = now + campaign["interval"]
+    
+    if result["success"]:
+        campaign["sent"] += 1
+    elif "retry_after" in result:
+        campaign["deferred"] += 1
+        if campaign["active"] and chat_key in account["chats"]:
+            _schedule(time.monotonic() + result["retry_after"], "send", campaign, account_id, chat_key)
+        return
+    else:
+        campaign["failed"] += 1
+        logger.error(f"Campaign send to {chat_key} from account {account_id} failed: {result.get('error')}")
+    await database.record_campaign_send(campaign["user_id"], account_id, chat_key, result["success"])
+
+async def _load_chats(campaign, account_id):
+    account = campaign["accounts"][account_id]
+    if campaign["target_mode"] == "selected":
+        target_groups = await database.get_target_groups(campaign["user_id"])
+        group_ids = [group.get('group_id') or group.get('id') for group in target_groups]
+        pending = [group for group, group_id in zip(target_groups, group_ids) if group_id not in account["chats"] and group_id not in account["skipped"]]
+        resolved = {}
+        if pending:
+            resolved, skipped = await telethon_handler.get_target_chats(account_id, pending)
+            for group_id in skipped:
+                account["skipped"].add(group_id)
+                await database.increment_stats(account_id, "messages_failed")
+                logger.error(f"Skipping group {group_id}: not accessible from account {account_id}")
+        return {group_id: account["chats"].get(group_id) or resolved[group_id] for group_id in group_ids if group_id in account["chats"] or group_id in resolved}
+    
+    result = await telethon_handler.get_groups_and_marketplaces(account_id)
+    if not result["success"]:
+        raise RuntimeError(result.get("error"))
+    return {chat["id"]: (chat["id"], chat.get("access_hash")) for chat in result["groups"] + result["marketplaces"]}
+
+async def _refresh_account(campaign, account_id):
+    account = campaign["accounts"][account_id]
+    try:
+        if campaign["use_forward"] and not account["chats"]:
+            await telethon_handler.get_saved_message_id(account_id)
+        chats = await _load_chats(campaign, account_id)
+    except Exception as e:
+        logger.warning(f"Could not load campaign chats for account {account_id}: {e}")
+        chats = None
+    
+    if campaign["active"] and chats is not None:
+        now = time.monotonic()
+        wall = time.time()
+        cycle = len(chats) * campaign["interval"]
+        served = 0
+        tail = max(account["tail"], account["next_slot"] - campaign["interval"], now - campaign["interval"])
+        for chat_key in chats:
+            if chat_key in account["chats"]:
+                continue
+            last_sent = account["ledger"].get(chat_key)
+            if last_sent is not None and wall - last_sent < cycle:
+                _schedule(now + last_sent + cycle - wall, "send", campaign, account_id, chat_key)
+                served += 1
+                continue
+            tail += campaign["interval"]
+            _schedule(tail, "send", campaign, account_id, chat_key)
+        for chat_key in account["chats"].keys() - chats.keys():
+            account["entries"].pop(chat_key, None)
+        account["tail"] = tail
+        account["chats"] = chats
+        if account["ledger"]:
+            account["position"] = served
+            account["ledger"] = {}
+        await database.create_or_update_stats(account_id, last_broadcast=datetime.utcnow())
+    
+    if campaign["active"]:
+        _push(time.monotonic() + config.CAMPAIGN_REFRESH_INTERVAL, "refresh", campaign, account_id)
+
+async def start_campaign(user_id, accounts, ad_text, interval, use_forward=False, target_mode="all", ad_media=None, replace=False):
+    if user_id in _starting or (user_id in _campaigns and not replace):
+        return None
+    _starting.add(user_id)
+    try:
+        await _halt_campaign(user_id)
+        await database.save_campaign(user_id, [account["_id"] for account in accounts], ad_text, ad_media, use_forward, interval, target_mode)
+        return _launch_campaign(user_id, [int(account["_id"]) for account in accounts], ad_text, interval, use_forward, target_mode, ad_media)
+    finally:
+        _starting.discard(user_id)
+
+def _launch_campaign(user_id, account_ids, ad_text, interval, use_forward, target_mode, ad_media, ledger=None, sent=0, failed=0):
+    _start_scheduler()
+    ledger = ledger or {}
+    
+    now = time.monotonic()
+    wall = time.time()
+    campaign = {
+        "user_id": user_id,
+        "ad_text": ad_text,
+        "media": ad_media,
+        "use_forward": use_forward,
+        "interval": max(interval, 1),
+        "target_mode": target_mode,
+        "accounts": {},
+        "active": True,
+        "tasks": set(),
+        "sent": sent,
+        "failed": failed,
+        "deferred": 0,
+        "current_account": None,
+        "started_at": time.time()
+    }
+    _campaigns[user_id] = campaign
+    
+    for account_id in account_ids:
+        account_ledger = {chat_id: sent_at for (ledger_account_id, chat_id), sent_at in ledger.items() if ledger_account_id == account_id}
+        last_sent = max(account_ledger.values(), default=None)
+        next_slot = now + max(last_sent + campaign["interval"] - wall, 0) if last_sent is not None else now
+        campaign["accounts"][account_id] = {"chats": {}, "entries": {}, "ledger": account_ledger, "skipped": set(), "position": 0, "sending": False, "parked_until": 0, "next_slot": next_slot, "tail": next_slot - campaign["interval"]}
+        _push(now, "refresh", campaign, account_id)
+    
+    logger.info(f"Started campaign for user {user_id} on {len(account_ids)} accounts every {campaign['interval']}s")
+    return campaign
+
+async def restore_campaigns():
+    restored = 0
+    for user_id in [row["user_id"] for row in await database.get_active_campaigns()]:
+        if user_id in _campaigns or user_id in _starting:
+            continue
+        _starting.add(user_id)
+        try:
+            accounts = await database.get_accounts(user_id, logged_in_only=True)
+            ledger = await database.get_campaign_ledger(user_id)
+            row = await database.get_campaign(user_id)
+            if not row or row["status"] != "active":
+                continue
+            logged_in = {int(account["_id"]) for account in accounts}
+            account_ids = [account_id for account_id in row["account_ids"] if account_id in logged_in]
+            if not account_ids:
+                logger.warning(f"Not resuming campaign for user {user_id}: no logged in accounts left")
+                await database.set_campaign_status(user_id, "stopped")
+                continue
+            ad_media = {"path": row["ad_media_path"], "type": row["ad_media_type"]} if row["ad_media_path"] else None
+            _launch_campaign(
+                user_id, account_ids, row["ad_text"], row["interval"], bool(row["use_forward"]), row["target_mode"],
+                ad_media, ledger, row["sent"], row["failed"]
+            )
+            restored += 1
+        except Exception as e:
+            logger.error(f"Error resuming campaign for user {user_id}: {e}")
+        finally:
+            _starting.discard(user_id)
+    logger.info(f"Resumed {restored} campaigns")
+    return restored
+
+async def stop_campaign(user_id):
+    running = await _halt_campaign(user_id)
+    stored = await database.set_campaign_status(user_id, "stopped")
+    return running or stored
+
+async def _halt_campaign(user_id):
+    global _stale_entries
+    campaign = _campaigns.pop(user_id, None)
+    if campaign is None:
+        return False
+    campaign["active"] = False
+    _stale_entries += sum(len(account["chats"]) + 1 for account in campaign["accounts"].values())
+    if _stale_entries > len(_heap) // 2:
+        _discard_stale_entries()
+    tasks = list(campaign["tasks"])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    logger.info(f"Stopped campaign for user {user_id}: {campaign['sent']} sent, {campaign['failed']} failed")
+    return True
+
+def is_campaign_running(user_id):
+    return user_id in _campaigns or user_id in _starting
+
+def get_campaign_status(user_id):
+    campaign = _campaigns.get(user_id)
+    if campaign is None:
+        return None
+    
+    now = time.monotonic()
+    next_send_in = None
+    cycle_eta = 0
+    for account in campaign["accounts"].values():
+        total = len(account["chats"])
+        if not total:
+            continue
+        wait = max(account["next_slot"] - now, 0)
+        remaining = total - account["position"] % total
+        next_send_in = wait if next_send_in is None else min(next_send_in, wait)
+        cycle_eta = max(cycle_eta, wait + (remaining - 1) * campaign["interval"])
+    
+    current = campaign["accounts"].get(campaign["current_account"])
+    chat_total = len(current["chats"]) if current else 0
+    return {
+        "accounts": len(campaign["accounts"]),
+        "current_account": campaign["current_account"],
+        "chat_index": (current["position"] - 1) % chat_total + 1 if current and chat_total and current["position"] else 0,
+        "chat_total": chat_total,
+        "chats": sum(len(account["chats"]) for account in campaign["accounts"].values()),
+        "sent": campaign["sent"],
+        "failed": campaign["failed"],
+        "deferred": campaign["deferred"],
+        "interval": campaign["interval"],
+        "next_send_in": next_send_in,
+        "cycle_eta": cycle_eta,
+        "uptime": time.time() - campaign["started_at"]
+    }
+
+def get_scheduler_stats():
+    return {
+        "campaigns": len(_campaigns),
+        "scheduled": len(_heap),
+        "in_flight": sum(len(campaign["tasks"]) for campaign in _campaigns.values())
+    }
+
+async def close_scheduler():
+    global _scheduler_task, _wakeup, _stale_entries
+    for user_id in list(_campaigns):
+        await _halt_campaign(user_id)
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        await asyncio.gather(_scheduler_task, return_exceptions=True)
+        _scheduler_task = None
+    _heap.clear()
+    _stale_entries = 0
+    _wakeup = None
@@ -10,12 +10,18 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "7315481856:")
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "a7e5f2d8c9b1a0f3e4d2c8b7a6f5e1d3c9a8b7f6e5d4c3b2a1f0e9d8c7b6a5")
 if not ENCRYPTION_KEY:
     ENCRYPTION_KEY = secrets.token_urlsafe(32)
+ENCRYPTION_OLD_KEYS = [x.strip() for x in os.getenv("ENCRYPTION_OLD_KEYS", "").split(",") if x.strip()]
 
 ADMIN_USER_IDS = [int(x) for x in os.getenv("ADMIN_USER_IDS", "6510174019").split(",") if x.strip()]
 
 SESSIONS_DIR = "sessions"
 os.makedirs(SESSIONS_DIR, exist_ok=True)
 
+AD_MEDIA_DIR = "ad_media"
+os.makedirs(AD_MEDIA_DIR, exist_ok=True)
+AD_MEDIA_MAX_SIZE = 20 * 1024 * 1024
+AD_MEDIA_CAPTION_LIMIT = 1024
+
 BOT_USERNAME = os.getenv("BOT_USERNAME", "PyToday Adbot")
 ACCOUNT_NAME_SUFFIX = os.getenv("ACCOUNT_NAME_SUFFIX", "PyAds")
 ACCOUNT_BIO_TEMPLATE = os.getenv("ACCOUNT_BIO_TEMPLATE", "Smart Ads")
@@ -39,3 +45,46 @@ CONNECTION_POOL_SIZE = 10
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 RETRY_DELAY = 5
+
+CREDENTIAL_CACHE_SIZE = int(os.getenv("CREDENTIAL_CACHE_SIZE", "1000"))
+CREDENTIAL_CACHE_TTL = int(os.getenv("CREDENTIAL_CACHE_TTL", "600"))
+
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", "4"))
+
+STATS_FLUSH_INTERVAL = int(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+STATS_FLUSH_THRESHOLD = int(os.getenv("STATS_FLUSH_THRESHOLD", "500"))
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1"))
+
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+DM_REPLIED_RETENTION_DAYS = int(os.getenv("DM_REPLIED_RETENTION_DAYS", "0"))
+COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", "3600"))
+COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", "1000"))
+COMPACTION_BATCH_PAUSE = float(os.getenv("COMPACTION_BATCH_PAUSE", "0.05"))
+COMPACTION_VACUUM_PAGES = int(os.getenv("COMPACTION_VACUUM_PAGES", "1000"))
+
+BOT_USER_CACHE_SIZE = int(os.getenv("BOT_USER_CACHE_SIZE", "10000"))
+LAST_SEEN_FLUSH_INTERVAL = int(os.getenv("LAST_SEEN_FLUSH_INTERVAL", "5"))
+BOT_USERS_COUNT_RECONCILE_INTERVAL = int(os.getenv("BOT_USERS_COUNT_RECONCILE_INTERVAL", "600"))
+
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "1000"))
+BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "50"))
+
+TELETHON_MAX_CLIENTS = int(os.getenv("TELETHON_MAX_CLIENTS", "50"))
+TELETHON_CLIENT_IDLE_TTL = int(os.getenv("TELETHON_CLIENT_IDLE_TTL", "300"))
+
+GROUP_CATALOG_TTL = int(os.getenv("GROUP_CATALOG_TTL", "300"))
+GROUP_CATALOG_FULL_REFRESH = int(os.getenv("GROUP_CATALOG_FULL_REFRESH", "86400"))
+GROUP_CATALOG_CHUNK_SIZE = int(os.getenv("GROUP_CATALOG_CHUNK_SIZE", "500"))
+
+LISTENER_RESTORE_CONCURRENCY = int(os.getenv("LISTENER_RESTORE_CONCURRENCY", "5"))
+LISTENER_RESTART_MIN_DELAY = int(os.getenv("LISTENER_RESTART_MIN_DELAY", "1"))
+LISTENER_RESTART_MAX_DELAY = int(os.getenv("LISTENER_RESTART_MAX_DELAY", "300"))
+LISTENER_STABLE_AFTER = int(os.getenv("LISTENER_STABLE_AFTER", "60"))
+REPLIED_INDEX_LOAD_BATCH = int(os.getenv("REPLIED_INDEX_LOAD_BATCH", "10000"))
+
+CAMPAIGN_REFRESH_INTERVAL = int(os.getenv("CAMPAIGN_REFRESH_INTERVAL", "300"))
+
+MARKETPLACE_KEYWORDS = [x.strip().lower() for x in os.getenv("MARKETPLACE_KEYWORDS", "market,shop,store,sell,buy,trade,deal,bazaar,mall,marketplace,bazar,selling,buying").split(",") if x.strip()]
@@ -1,8 +1,17 @@
 import motor.motor_asyncio
 import aiosqlite
-from datetime import datetime
+import json
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
 from PyToday import *
+from PyToday.encryption import decrypt_data, rotate_data
+from PyToday.session_store import delete_session
 import asyncio
 import logging
 
@@ -12,6 +21,96 @@ mongo_client = None
 mongo_db = None
 sqlite_db_path = config.SQLITE_DB_PATH
 
+CREDENTIAL_FIELDS = {"api_id", "api_hash", "session_string", "is_logged_in"}
+_credentials_cache = OrderedDict()
+_credentials_generation = 0
+
+STAT_COUNTERS = ("messages_sent", "messages_failed", "groups_joined", "auto_replies_sent")
+_pending_stats = {}
+_pending_stats_count = 0
+_pending_last_used = {}
+_background_tasks = {}
+
+_known_bot_users = OrderedDict()
+_pending_last_seen = {}
+_bot_users_count = 0
+_replied_index = {}
+_pending_ledger = {}
+_pending_campaign_counts = {}
+
+_log_queue = None
+_log_writer_hook = None
+_log_writer_stats = {"flushes": 0, "rows_written": 0, "rows_dropped": 0, "last_batch_size": 0, "last_flush_ms": 0.0}
+
+_writer = None
+_readers = None
+_reader_connections = []
+_write_lock = None
+_open_lock = asyncio.Lock()
+
+async def _connect():
+    db = await aiosqlite.connect(sqlite_db_path)
+    db.row_factory = aiosqlite.Row
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.execute(f"PRAGMA busy_timeout={config.REQUEST_TIMEOUT * 1000}")
+    return db
+
+async def open_sqlite():
+    global _writer, _readers, _write_lock
+    async with _open_lock:
+        if _writer is not None:
+            return
+        writer = await _connect()
+        readers = asyncio.Queue()
+        for _ in range(config.SQLITE_READER_POOL_SIZE):
+            conn = await _connect()
+            _reader_connections.append(conn)
+            readers.put_nowait(conn)
+        _write_lock = asyncio.Lock()
+        _readers = readers
+        _writer = writer
+        logger.info(f"SQLite pool opened (1 writer, {config.SQLITE_READER_POOL_SIZE} readers)")
+
+async def close_sqlite():
+    global _writer, _readers, _write_lock, _open_lock
+    if _writer is None:
+        return
+    async with _write_lock:
+        for conn in _reader_connections:
+            await conn.close()
+        _reader_connections.clear()
+        await _writer.close()
+        _writer = None
+        _readers = None
+    _write_lock = None
+    _open_lock = asyncio.Lock()
+    logger.info("SQLite pool closed")
+
+@asynccontextmanager
+async def _read():
+    if _writer is None:
+        await open_sqlite()
+    readers = _readers
+    db = await readers.get()
+    try:
+        yield db
+    finally:
+        readers.put_nowait(db)
+
+@asynccontextmanager
+async def _write():
+    if _writer is None:
+        await open_sqlite()
+    async with _write_lock:
+        try:
+            yield _writer
+        except BaseException:
+            await _writer.rollback()
+            raise
+        else:
+            await _writer.commit()
+
 async def init_db():
     global mongo_client, mongo_db
     
@@ -27,12 +126,16 @@ async def init_db():
             )
             mongo_db = mongo_client.telegram_adbot
             await mongo_db.bot_users.create_index("_id")
+            await _seed_bot_users_count()
+            _start_background_task("last_seen_flush", _last_seen_flush_loop)
+            _start_background_task("bot_users_count", _bot_users_count_loop)
             logger.info("MongoDB connected successfully")
         except Exception as e:
             logger.error(f"MongoDB connection failed: {e}")
             raise
     
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    await open_sqlite()
+    async with _write() as db:
         await db.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 user_id INTEGER PRIMARY KEY,
@@ -164,8 +267,154 @@ async def init_db():
         if not await existing.fetchone():
             await db.execute("INSERT INTO force_sub (id, enabled) VALUES (1, 0)")
         
-        await db.commit()
-        logger.info("SQLite database initialized successfully")
+        await run_migrations(db)
+    
+    _start_background_task("stats_flush", _stats_flush_loop)
+    _start_log_writer()
+    await _enable_incremental_vacuum()
+    if config.LOG_RETENTION_DAYS > 0 or config.DM_REPLIED_RETENTION_DAYS > 0:
+        _start_background_task("log_compaction", _compaction_loop)
+    logger.info("SQLite database initialized successfully")
+
+MIGRATIONS = [
+    (1, [
+        # Merge duplicate stats rows so account_id can become unique.
+        '''
+        UPDATE account_stats SET
+            messages_sent = (SELECT SUM(s.messages_sent) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            messages_failed = (SELECT SUM(s.messages_failed) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            groups_joined = (SELECT SUM(s.groups_joined) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            auto_replies_sent = (SELECT SUM(s.auto_replies_sent) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            groups_count = (SELECT MAX(s.groups_count) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            marketplaces_count = (SELECT MAX(s.marketplaces_count) FROM account_stats s WHERE s.account_id = account_stats.account_id),
+            last_broadcast = (SELECT MAX(s.last_broadcast) FROM account_stats s WHERE s.account_id = account_stats.account_id)
+        WHERE id IN (SELECT MIN(id) FROM account_stats GROUP BY account_id HAVING COUNT(*) > 1)
+        ''',
+        "DELETE FROM account_stats WHERE id NOT IN (SELECT MIN(id) FROM account_stats GROUP BY account_id)",
+        "DELETE FROM target_groups WHERE id NOT IN (SELECT MIN(id) FROM target_groups GROUP BY user_id, group_id)",
+        "DELETE FROM dm_replied_users WHERE id NOT IN (SELECT MIN(id) FROM dm_replied_users GROUP BY account_id, user_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_account_stats_account ON account_stats (account_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_target_groups_user_group ON target_groups (user_id, group_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_dm_replied_account_user ON dm_replied_users (account_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_accounts_user ON telegram_accounts (user_id, is_logged_in)",
+        "CREATE INDEX IF NOT EXISTS idx_auto_reply_logs_account ON auto_reply_logs (account_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_group_join_logs_account ON group_join_logs (account_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_message_logs_account ON message_logs (account_id, created_at)",
+    ]),
+    (2, [
+        '''
+        CREATE TABLE IF NOT EXISTS log_daily_summary (
+            account_id INTEGER,
+            day TEXT,
+            kind TEXT,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (account_id, day, kind)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_dm_replied_replied_at ON dm_replied_users (replied_at)",
+    ]),
+    (3, [
+        '''
+        CREATE TABLE IF NOT EXISTS account_groups (
+            account_id INTEGER,
+            group_id INTEGER,
+            title TEXT,
+            access_hash INTEGER,
+            members INTEGER DEFAULT 0,
+            dialog_date INTEGER DEFAULT 0,
+            PRIMARY KEY (account_id, group_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS account_group_sync (
+            account_id INTEGER PRIMARY KEY,
+            synced_at REAL DEFAULT 0,
+            full_synced_at REAL DEFAULT 0,
+            top_date INTEGER DEFAULT 0
+        )
+        ''',
+    ]),
+    (4, [
+        "ALTER TABLE users ADD COLUMN ad_media_path TEXT",
+        "ALTER TABLE users ADD COLUMN ad_media_type TEXT",
+    ]),
+    (5, [
+        '''
+        CREATE TABLE IF NOT EXISTS campaigns (
+            user_id INTEGER PRIMARY KEY,
+            account_ids TEXT NOT NULL,
+            ad_text TEXT,
+            ad_media_path TEXT,
+            ad_media_type TEXT,
+            use_forward INTEGER DEFAULT 0,
+            interval INTEGER DEFAULT 60,
+            target_mode TEXT DEFAULT 'all',
+            status TEXT DEFAULT 'active',
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            started_at TEXT,
+            updated_at TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS campaign_ledger (
+            user_id INTEGER,
+            account_id INTEGER,
+            chat_id INTEGER,
+            last_sent_at REAL,
+            PRIMARY KEY (user_id, account_id, chat_id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_campaign_ledger_account ON campaign_ledger (account_id)",
+    ]),
+]
+
+async def run_migrations(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TEXT
+        )
+    ''')
+    cursor = await db.execute("SELECT MAX(version) FROM schema_version")
+    row = await cursor.fetchone()
+    current = row[0] or 0
+    
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            await db.execute(statement)
+        await db.execute(
+            "INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+            (version, datetime.utcnow().isoformat())
+        )
+        logger.info(f"Applied SQLite schema migration {version}")
+
+def _start_background_task(name, coro_factory):
+    task = _background_tasks.get(name)
+    if task is None or task.done():
+        _background_tasks[name] = asyncio.create_task(coro_factory())
+
+async def _stop_background_tasks():
+    tasks = list(_background_tasks.values())
+    _background_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def close_db():
+    global mongo_client, mongo_db
+    await _stop_log_writer()
+    await _stop_background_tasks()
+    await flush_stats()
+    await flush_campaign_ledger()
+    await close_sqlite()
+    await flush_last_seen()
+    if mongo_client is not None:
+        mongo_client.close()
+        mongo_client = None
+        mongo_db = None
 
 async def get_mongo_db():
     global mongo_db
@@ -174,56 +423,111 @@ async def get_mongo_db():
     return mongo_db
 
 async def save_bot_user(user_id: int, username: str = None, first_name: str = None, last_name: str = None):
+    global _bot_users_count
     database = await get_mongo_db()
     if database is not None:
+        profile = (username, first_name, last_name)
+        now = datetime.utcnow()
+        if _known_bot_users.get(user_id) == profile:
+            _known_bot_users.move_to_end(user_id)
+            _pending_last_seen[user_id] = now
+            return
         try:
-            existing = await database.bot_users.find_one({"_id": user_id})
-            if existing:
-                await database.bot_users.update_one(
-                    {"_id": user_id},
-                    {"$set": {
+            result = await database.bot_users.update_one(
+                {"_id": user_id},
+                {
+                    "$set": {
                         "username": username,
                         "first_name": first_name,
                         "last_name": last_name,
-                        "last_seen": datetime.utcnow()
-                    }}
-                )
-            else:
-                await database.bot_users.insert_one({
-                    "_id": user_id,
-                    "username": username,
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "created_at": datetime.utcnow(),
-                    "last_seen": datetime.utcnow()
-                })
+                        "last_seen": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                _bot_users_count += 1
+            _pending_last_seen.pop(user_id, None)
+            _known_bot_users[user_id] = profile
+            _known_bot_users.move_to_end(user_id)
+            while len(_known_bot_users) > config.BOT_USER_CACHE_SIZE:
+                _known_bot_users.popitem(last=False)
         except Exception as e:
             logger.error(f"Error saving bot user to MongoDB: {e}")
 
-async def get_all_bot_users():
+async def flush_last_seen():
+    global _pending_last_seen
+    if not _pending_last_seen or mongo_db is None:
+        return 0
+    pending = _pending_last_seen
+    _pending_last_seen = {}
+    try:
+        await mongo_db.bot_users.bulk_write(
+            [UpdateOne({"_id": user_id}, {"$set": {"last_seen": seen}}) for user_id, seen in pending.items()],
+            ordered=False
+        )
+    except Exception as e:
+        logger.error(f"Error flushing last_seen for {len(pending)} users: {e}")
+        for user_id, seen in pending.items():
+            _pending_last_seen.setdefault(user_id, seen)
+        return 0
+    return len(pending)
+
+async def _last_seen_flush_loop():
+    while True:
+        await asyncio.sleep(config.LAST_SEEN_FLUSH_INTERVAL)
+        await flush_last_seen()
+
+async def iter_bot_user_ids(after_id=None, batch_size: int = None):
     database = await get_mongo_db()
-    if database is not None:
-        try:
-            cursor = database.bot_users.find({})
-            return await cursor.to_list(length=None)
-        except Exception as e:
-            logger.error(f"Error getting bot users: {e}")
-            return []
-    return []
+    if database is None:
+        return
+    query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+    cursor = (
+        database.bot_users.find(query, {"_id": 1})
+        .sort("_id", 1)
+        .batch_size(batch_size or config.BROADCAST_BATCH_SIZE)
+    )
+    try:
+        async for doc in cursor:
+            yield doc["_id"]
+    finally:
+        await cursor.close()
+
+async def _seed_bot_users_count():
+    global _bot_users_count
+    try:
+        _bot_users_count = await mongo_db.bot_users.estimated_document_count()
+    except Exception as e:
+        logger.error(f"Error estimating bot users count: {e}")
+
+async def reconcile_bot_users_count():
+    global _bot_users_count
+    if mongo_db is None:
+        return _bot_users_count
+    try:
+        _bot_users_count = await mongo_db.bot_users.count_documents({})
+    except Exception as e:
+        logger.error(f"Error counting bot users: {e}")
+    return _bot_users_count
+
+async def _bot_users_count_loop():
+    while True:
+        await asyncio.sleep(config.BOT_USERS_COUNT_RECONCILE_INTERVAL)
+        await reconcile_bot_users_count()
 
 async def get_bot_users_count():
-    database = await get_mongo_db()
-    if database is not None:
-        try:
-            return await database.bot_users.count_documents({})
-        except Exception as e:
-            logger.error(f"Error counting bot users: {e}")
-            return 0
-    return 0
+    return _bot_users_count
+
+async def get_auto_reply_users():
+    async with _read() as db:
+        cursor = await db.execute("SELECT user_id, auto_reply_text FROM users WHERE auto_reply_enabled = 1")
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
 
 async def get_user(user_id: int):
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         row = await cursor.fetchone()
         if row:
@@ -231,26 +535,23 @@ async def get_user(user_id: int):
         return None
 
 async def create_user(user_id: int, username: str = None, first_name: str = None):
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         await db.execute('''
             INSERT OR REPLACE INTO users (user_id, username, first_name, created_at, auto_reply_text)
             VALUES (?, ?, ?, ?, ?)
         ''', (user_id, username, first_name, datetime.utcnow().isoformat(), config.AUTO_REPLY_TEXT))
-        await db.commit()
     return await get_user(user_id)
 
 async def update_user(user_id: int, **kwargs):
     if not kwargs:
         return
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
         values = list(kwargs.values()) + [user_id]
         await db.execute(f"UPDATE users SET {set_clause} WHERE user_id = ?", values)
-        await db.commit()
 
 async def get_accounts(user_id: int, logged_in_only: bool = False):
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         query = "SELECT * FROM telegram_accounts WHERE user_id = ?"
         if logged_in_only:
             query += " AND is_logged_in = 1"
@@ -261,39 +562,87 @@ async def get_accounts(user_id: int, logged_in_only: bool = False):
 async def get_account(account_id) -> dict:
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         cursor = await db.execute("SELECT * FROM telegram_accounts WHERE id = ?", (account_id,))
         row = await cursor.fetchone()
         if row:
             return {"_id": row["id"], **dict(row)}
         return None
 
+async def get_account_credentials(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    now = time.monotonic()
+    cached = _credentials_cache.get(account_id)
+    if cached and cached[0] > now:
+        _credentials_cache.move_to_end(account_id)
+        return cached[1]
+    
+    generation = _credentials_generation
+    account = await get_account(account_id)
+    if not account or not account.get('is_logged_in'):
+        _credentials_cache.pop(account_id, None)
+        return None
+    
+    credentials = (
+        decrypt_data(account.get('api_id', '')),
+        decrypt_data(account.get('api_hash', '')),
+        decrypt_data(account.get('session_string', ''))
+    )
+    if generation == _credentials_generation:
+        _credentials_cache[account_id] = (now + config.CREDENTIAL_CACHE_TTL, credentials)
+        _credentials_cache.move_to_end(account_id)
+        while len(_credentials_cache) > config.CREDENTIAL_CACHE_SIZE:
+            _credentials_cache.popitem(last=False)
+    return credentials
+
+def invalidate_account_credentials(account_id=None):
+    global _credentials_generation
+    _credentials_generation += 1
+    if account_id is None:
+        _credentials_cache.clear()
+    else:
+        _credentials_cache.pop(int(account_id), None)
+
+async def rotate_account_secrets():
+    async with _write() as db:
+        cursor = await db.execute("SELECT id, api_id, api_hash, session_string FROM telegram_accounts")
+        updates = []
+        for row in await cursor.fetchall():
+            current = (row["api_id"], row["api_hash"], row["session_string"])
+            rotated = tuple(rotate_data(value) if value else value for value in current)
+            if rotated != current:
+                updates.append(rotated + (row["id"],))
+        await db.executemany("UPDATE telegram_accounts SET api_id = ?, api_hash = ?, session_string = ? WHERE id = ?", updates)
+    if updates:
+        invalidate_account_credentials()
+    return len(updates)
+
 async def create_account(user_id: int, phone: str, api_id: str, api_hash: str):
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         cursor = await db.execute('''
             INSERT INTO telegram_accounts (user_id, phone, api_id, api_hash, created_at)
             VALUES (?, ?, ?, ?, ?)
         ''', (user_id, phone, api_id, api_hash, datetime.utcnow().isoformat()))
-        await db.commit()
         account_id = cursor.lastrowid
-        return await get_account(account_id)
+    return await get_account(account_id)
 
 async def update_account(account_id, **kwargs):
     if isinstance(account_id, str):
         account_id = int(account_id)
     if not kwargs:
         return
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
         values = list(kwargs.values()) + [account_id]
         await db.execute(f"UPDATE telegram_accounts SET {set_clause} WHERE id = ?", values)
-        await db.commit()
+    if CREDENTIAL_FIELDS & kwargs.keys():
+        invalidate_account_credentials(account_id)
 
 async def delete_account(account_id, user_id: int = None):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         query = "DELETE FROM telegram_accounts WHERE id = ?"
         params = [account_id]
         if user_id:
@@ -301,155 +650,668 @@ async def delete_account(account_id, user_id: int = None):
             params.append(user_id)
         cursor = await db.execute(query, params)
         await db.execute("DELETE FROM account_stats WHERE account_id = ?", (account_id,))
-        await db.commit()
-        return cursor.rowcount > 0
+        await db.execute("DELETE FROM account_groups WHERE account_id = ?", (account_id,))
+        await db.execute("DELETE FROM account_group_sync WHERE account_id = ?", (account_id,))
+        await db.execute("DELETE FROM campaign_ledger WHERE account_id = ?", (account_id,))
+    for key in [key for key in _pending_stats if key[0] == account_id]:
+        del _pending_stats[key]
+    _pending_last_used.pop(account_id, None)
+    _replied_index.pop(account_id, None)
+    invalidate_account_credentials(account_id)
+    if cursor.rowcount > 0:
+        delete_session(account_id)
+    return cursor.rowcount > 0
 
 async def get_account_stats(account_id):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         cursor = await db.execute("SELECT * FROM account_stats WHERE account_id = ?", (account_id,))
         row = await cursor.fetchone()
-        if row:
-            return dict(row)
-        return None
+    
+    stats = dict(row) if row else None
+    pending = {field: amount for (acc_id, field), amount in _pending_stats.items() if acc_id == account_id}
+    if pending:
+        if stats is None:
+            stats = {"account_id": account_id, "groups_count": 0, "marketplaces_count": 0, "last_broadcast": None}
+            stats.update({field: 0 for field in STAT_COUNTERS})
+        for field, amount in pending.items():
+            stats[field] = (stats.get(field) or 0) + amount
+    return stats
 
 async def create_or_update_stats(account_id, **kwargs):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    stats = await get_account_stats(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        if stats:
-            set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
-            values = list(kwargs.values()) + [account_id]
-            await db.execute(f"UPDATE account_stats SET {set_clause} WHERE account_id = ?", values)
-        else:
-            await db.execute('''
-                INSERT INTO account_stats (account_id, messages_sent, messages_failed, groups_count, marketplaces_count, groups_joined, auto_replies_sent)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                account_id,
-                kwargs.get("messages_sent", 0),
-                kwargs.get("messages_failed", 0),
-                kwargs.get("groups_count", 0),
-                kwargs.get("marketplaces_count", 0),
-                kwargs.get("groups_joined", 0),
-                kwargs.get("auto_replies_sent", 0)
-            ))
-        await db.commit()
+    if not kwargs:
+        return
+    columns = ", ".join(kwargs.keys())
+    placeholders = ", ".join(["?"] * (len(kwargs) + 1))
+    set_clause = ", ".join([f"{k} = excluded.{k}" for k in kwargs.keys()])
+    async with _write() as db:
+        await db.execute(
+            f"INSERT INTO account_stats (account_id, {columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(account_id) DO UPDATE SET {set_clause}",
+            [account_id] + list(kwargs.values())
+        )
 
 async def increment_stats(account_id, field: str, amount: int = 1):
+    global _pending_stats_count
     if isinstance(account_id, str):
         account_id = int(account_id)
-    stats = await get_account_stats(account_id)
-    if stats:
-        async with aiosqlite.connect(sqlite_db_path) as db:
-            await db.execute(f"UPDATE account_stats SET {field} = {field} + ? WHERE account_id = ?", (amount, account_id))
-            await db.commit()
-    else:
-        await create_or_update_stats(account_id, **{field: amount})
+    if field not in STAT_COUNTERS:
+        raise ValueError(f"Unknown stats counter: {field}")
+    key = (account_id, field)
+    _pending_stats[key] = _pending_stats.get(key, 0) + amount
+    _pending_stats_count += 1
+    if _pending_stats_count >= config.STATS_FLUSH_THRESHOLD:
+        await flush_stats()
+
+async def mark_account_used(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    _pending_last_used[account_id] = datetime.utcnow()
+
+async def flush_stats():
+    global _pending_stats, _pending_stats_count, _pending_last_used
+    if not _pending_stats and not _pending_last_used:
+        return 0
+    pending = _pending_stats
+    last_used = _pending_last_used
+    _pending_stats = {}
+    _pending_stats_count = 0
+    _pending_last_used = {}
+    
+    by_field = {}
+    for (account_id, field), amount in pending.items():
+        by_field.setdefault(field, []).append((account_id, amount))
+    try:
+        async with _write() as db:
+            for field, rows in by_field.items():
+                await db.executemany(
+                    f"INSERT INTO account_stats (account_id, {field}) VALUES (?, ?) "
+                    f"ON CONFLICT(account_id) DO UPDATE SET {field} = {field} + excluded.{field}",
+                    rows
+                )
+            await db.executemany(
+                "UPDATE telegram_accounts SET last_used = ? WHERE id = ?",
+                [(used_at, account_id) for account_id, used_at in last_used.items()]
+            )
+    except Exception as e:
+        logger.error(f"Error flushing stats, keeping {len(pending)} counters for retry: {e}")
+        for key, amount in pending.items():
+            _pending_stats[key] = _pending_stats.get(key, 0) + amount
+        for account_id, used_at in last_used.items():
+            _pending_last_used.setdefault(account_id, used_at)
+        return 0
+    return len(pending)
+
+async def _stats_flush_loop():
+    while True:
+        await asyncio.sleep(config.STATS_FLUSH_INTERVAL)
+        await flush_stats()
+        await flush_campaign_ledger()
+
+LOG_INSERTS = {
+    "message_logs": "INSERT INTO message_logs (user_id, account_id, chat_id, chat_title, status, error_message, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "auto_reply_logs": "INSERT INTO auto_reply_logs (account_id, from_user_id, from_username, created_at) VALUES (?, ?, ?, ?)",
+    "group_join_logs": "INSERT INTO group_join_logs (account_id, group_id, group_title, invite_link, created_at) VALUES (?, ?, ?, ?, ?)",
+    "dm_replied_users": "INSERT OR IGNORE INTO dm_replied_users (account_id, user_id, username, replied_at) VALUES (?, ?, ?, ?)",
+}
+
+def set_log_writer_hook(callback):
+    global _log_writer_hook
+    _log_writer_hook = callback
+
+def get_log_writer_stats():
+    return {
+        **_log_writer_stats,
+        "queue_depth": _log_queue.qsize() if _log_queue is not None else 0,
+        "queue_size": config.LOG_QUEUE_SIZE,
+        "running": _log_queue is not None,
+    }
+
+async def _enqueue_log(table, params):
+    if _log_queue is None:
+        async with _write() as db:
+            await db.execute(LOG_INSERTS[table], params)
+        return
+    await _log_queue.put((table, params))
+
+async def _write_log_batch(batch):
+    by_table = {}
+    for table, params in batch:
+        by_table.setdefault(table, []).append(params)
+    
+    started = time.perf_counter()
+    try:
+        async with _write() as db:
+            for table, rows in by_table.items():
+                await db.executemany(LOG_INSERTS[table], rows)
+    except Exception as e:
+        logger.error(f"Error writing {len(batch)} log rows: {e}")
+        _log_writer_stats["rows_dropped"] += len(batch)
+        return
+    
+    _log_writer_stats["flushes"] += 1
+    _log_writer_stats["rows_written"] += len(batch)
+    _log_writer_stats["last_batch_size"] = len(batch)
+    _log_writer_stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+    if _log_writer_hook is not None:
+        try:
+            _log_writer_hook(get_log_writer_stats())
+        except Exception as e:
+            logger.warning(f"Log writer hook failed: {e}")
+
+async def _log_writer_loop(queue):
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        item = await queue.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = loop.time() + config.LOG_FLUSH_INTERVAL
+        while len(batch) < config.LOG_BATCH_SIZE:
+            try:
+                if queue.empty():
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                else:
+                    item = queue.get_nowait()
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        await _write_log_batch(batch)
+
+def _start_log_writer():
+    global _log_queue
+    if _log_queue is None:
+        _log_queue = asyncio.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    queue = _log_queue
+    _start_background_task("log_writer", lambda: _log_writer_loop(queue))
+
+async def _stop_log_writer():
+    global _log_queue
+    queue = _log_queue
+    task = _background_tasks.pop("log_writer", None)
+    if queue is None:
+        return
+    if task is not None and not task.done():
+        await queue.put(None)
+        await task
+    _log_queue = None
+    leftover = []
+    while not queue.empty():
+        item = queue.get_nowait()
+        if item is not None:
+            leftover.append(item)
+    if leftover:
+        await _write_log_batch(leftover)
+
+LOG_ROLLUPS = [
+    ("auto_reply_logs", "'auto_reply'"),
+    ("group_join_logs", "'group_join'"),
+    ("message_logs", "'message_' || COALESCE(status, 'pending')"),
+]
+
+async def _enable_incremental_vacuum():
+    async with _write_lock:
+        cursor = await _writer.execute("PRAGMA auto_vacuum")
+        row = await cursor.fetchone()
+        if row and row[0] == 2:
+            return
+        logger.info("Switching SQLite to incremental auto_vacuum (one-time VACUUM)")
+        await _writer.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await _writer.execute("VACUUM")
+
+async def _rollup_batch(table, kind, cutoff):
+    async with _write() as db:
+        cursor = await db.execute(
+            f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE created_at < ? ORDER BY id LIMIT ?)",
+            (cutoff, config.COMPACTION_BATCH_SIZE)
+        )
+        row = await cursor.fetchone()
+        max_id = row[0] if row else None
+        if max_id is None:
+            return 0
+        await db.execute(f'''
+            INSERT INTO log_daily_summary (account_id, day, kind, count)
+            SELECT account_id, substr(created_at, 1, 10), {kind}, COUNT(*)
+            FROM {table}
+            WHERE id <= ? AND created_at < ?
+            GROUP BY 1, 2, 3
+            ON CONFLICT(account_id, day, kind) DO UPDATE SET count = count + excluded.count
+        ''', (max_id, cutoff))
+        cursor = await db.execute(f"DELETE FROM {table} WHERE id <= ? AND created_at < ?", (max_id, cutoff))
+        return cursor.rowcount
+
+async def _expire_replied_batch(cutoff):
+    async with _write() as db:
+        cursor = await db.execute(
+            "SELECT id, account_id, user_id FROM dm_replied_users WHERE replied_at < ? LIMIT ?",
+            (cutoff, config.COMPACTION_BATCH_SIZE)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            return 0
+        await db.executemany("DELETE FROM dm_replied_users WHERE id = ?", [(row[0],) for row in rows])
+    for _, account_id, user_id in rows:
+        index = _replied_index.get(account_id)
+        if index is not None:
+            position, found = _index_position(index, user_id)
+            if found:
+                del index[position]
+    return len(rows)
+
+async def compact_logs():
+    compacted = 0
+    if config.LOG_RETENTION_DAYS > 0:
+        cutoff = (datetime.utcnow() - timedelta(days=config.LOG_RETENTION_DAYS)).isoformat()
+        for table, kind in LOG_ROLLUPS:
+            while True:
+                moved = await _rollup_batch(table, kind, cutoff)
+                compacted += moved
+                if moved < config.COMPACTION_BATCH_SIZE:
+                    break
+                await asyncio.sleep(config.COMPACTION_BATCH_PAUSE)
+    
+    if config.DM_REPLIED_RETENTION_DAYS > 0:
+        cutoff = (datetime.utcnow() - timedelta(days=config.DM_REPLIED_RETENTION_DAYS)).isoformat()
+        while True:
+            removed = await _expire_replied_batch(cutoff)
+            compacted += removed
+            if removed < config.COMPACTION_BATCH_SIZE:
+                break
+            await asyncio.sleep(config.COMPACTION_BATCH_PAUSE)
+    
+    if compacted:
+        async with _write_lock:
+            cursor = await _writer.execute(f"PRAGMA incremental_vacuum({config.COMPACTION_VACUUM_PAGES})")
+            await cursor.fetchall()
+        logger.info(f"Compacted {compacted} log rows")
+    return compacted
+
+async def _compaction_loop():
+    while True:
+        try:
+            await compact_logs()
+        except Exception as e:
+            logger.error(f"Log compaction failed: {e}")
+        await asyncio.sleep(config.COMPACTION_INTERVAL)
 
 async def create_message_log(user_id: int, account_id, chat_id: int, chat_title: str = None, status: str = "pending", error_message: str = None):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        await db.execute('''
-            INSERT INTO message_logs (user_id, account_id, chat_id, chat_title, status, error_message, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, account_id, chat_id, chat_title, status, error_message, datetime.utcnow().isoformat()))
-        await db.commit()
+    await _enqueue_log("message_logs", (user_id, account_id, chat_id, chat_title, status, error_message, datetime.utcnow().isoformat()))
 
 async def add_target_group(user_id: int, group_id: int, group_title: str = None):
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        cursor = await db.execute("SELECT * FROM target_groups WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-        if not await cursor.fetchone():
-            await db.execute('''
-                INSERT INTO target_groups (user_id, group_id, group_title, added_at)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, group_id, group_title, datetime.utcnow().isoformat()))
-            await db.commit()
-            return True
-        return False
+    async with _write() as db:
+        cursor = await db.execute('''
+            INSERT OR IGNORE INTO target_groups (user_id, group_id, group_title, added_at)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, group_id, group_title, datetime.utcnow().isoformat()))
+        return cursor.rowcount > 0
 
 async def remove_target_group(user_id: int, group_id: int):
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         cursor = await db.execute("DELETE FROM target_groups WHERE user_id = ? AND group_id = ?", (user_id, group_id))
-        await db.commit()
         return cursor.rowcount > 0
 
 async def get_target_groups(user_id: int):
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         cursor = await db.execute("SELECT * FROM target_groups WHERE user_id = ?", (user_id,))
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
+async def save_campaign(user_id: int, account_ids, ad_text=None, ad_media=None, use_forward=False, interval=60, target_mode="all"):
+    for key in [key for key in _pending_ledger if key[0] == user_id]:
+        del _pending_ledger[key]
+    _pending_campaign_counts.pop(user_id, None)
+    now = datetime.utcnow().isoformat()
+    async with _write() as db:
+        await db.execute("DELETE FROM campaign_ledger WHERE user_id = ?", (user_id,))
+        await db.execute('''
+            INSERT INTO campaigns (user_id, account_ids, ad_text, ad_media_path, ad_media_type, use_forward, interval, target_mode, status, sent, failed, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active', 0, 0, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                account_ids = excluded.account_ids,
+                ad_text = excluded.ad_text,
+                ad_media_path = excluded.ad_media_path,
+                ad_media_type = excluded.ad_media_type,
+                use_forward = excluded.use_forward,
+                interval = excluded.interval,
+                target_mode = excluded.target_mode,
+                status = 'active',
+                sent = 0,
+                failed = 0,
+                started_at = excluded.started_at,
+                updated_at = excluded.updated_at
+        ''', (
+            user_id, json.dumps([int(account_id) for account_id in account_ids]), ad_text,
+            ad_media["path"] if ad_media else None, ad_media["type"] if ad_media else None,
+            int(bool(use_forward)), interval, target_mode, now, now
+        ))
+
+async def set_campaign_status(user_id: int, status: str):
+    async with _write() as db:
+        cursor = await db.execute(
+            "UPDATE campaigns SET status = ?, updated_at = ? WHERE user_id = ? AND status != ?",
+            (status, datetime.utcnow().isoformat(), user_id, status)
+        )
+        return cursor.rowcount > 0
+
+async def get_campaign(user_id: int):
+    async with _read() as db:
+        cursor = await db.execute("SELECT * FROM campaigns WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        return {**dict(row), "account_ids": json.loads(row["account_ids"])}
+
+async def is_ad_media_in_use(path: str):
+    async with _read() as db:
+        cursor = await db.execute(
+            "SELECT 1 FROM users WHERE ad_media_path = ? UNION ALL SELECT 1 FROM campaigns WHERE ad_media_path = ? AND status = 'active' LIMIT 1",
+            (path, path)
+        )
+        return await cursor.fetchone() is not None
+
+async def get_active_campaigns():
+    async with _read() as db:
+        cursor = await db.execute("SELECT * FROM campaigns WHERE status = 'active'")
+        rows = await cursor.fetchall()
+        return [{**dict(row), "account_ids": json.loads(row["account_ids"])} for row in rows]
+
+async def get_campaign_ledger(user_id: int):
+    async with _read() as db:
+        cursor = await db.execute("SELECT account_id, chat_id, last_sent_at FROM campaign_ledger WHERE user_id = ?", (user_id,))
+        rows = await cursor.fetchall()
+    ledger = {(row[0], row[1]): row[2] for row in rows}
+    for (pending_user_id, account_id, chat_id), sent_at in _pending_ledger.items():
+        if pending_user_id == user_id:
+            ledger[(account_id, chat_id)] = sent_at
+    return ledger
+
+async def record_campaign_send(user_id: int, account_id, chat_id: int, success: bool):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    counts = _pending_campaign_counts.setdefault(user_id, [0, 0])
+    if success:
+        _pending_ledger[(user_id, account_id, chat_id)] = time.time()
+        counts[0] += 1
+    else:
+        counts[1] += 1
+
+async def flush_campaign_ledger():
+    global _pending_ledger, _pending_campaign_counts
+    if not _pending_ledger and not _pending_campaign_counts:
+        return 0
+    ledger = _pending_ledger
+    counts = _pending_campaign_counts
+    _pending_ledger = {}
+    _pending_campaign_counts = {}
+    now = datetime.utcnow().isoformat()
+    try:
+        async with _write() as db:
+            await db.executemany(
+                "INSERT INTO campaign_ledger (user_id, account_id, chat_id, last_sent_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, account_id, chat_id) DO UPDATE SET last_sent_at = excluded.last_sent_at",
+                [(user_id, account_id, chat_id, sent_at) for (user_id, account_id, chat_id), sent_at in ledger.items()]
+            )
+            await db.executemany(
+                "UPDATE campaigns SET sent = sent + ?, failed = failed + ?, updated_at = ? WHERE user_id = ?",
+                [(sent, failed, now, user_id) for user_id, (sent, failed) in counts.items()]
+            )
+    except Exception as e:
+        logger.error(f"Error flushing campaign ledger, keeping {len(ledger)} entries for retry: {e}")
+        for key, sent_at in ledger.items():
+            _pending_ledger.setdefault(key, sent_at)
+        for user_id, (sent, failed) in counts.items():
+            pending = _pending_campaign_counts.setdefault(user_id, [0, 0])
+            pending[0] += sent
+            pending[1] += failed
+        return 0
+    return len(ledger)
+
+async def get_account_groups(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    async with _read() as db:
+        cursor = await db.execute(
+            "SELECT group_id, title, access_hash, members FROM account_groups WHERE account_id = ? ORDER BY dialog_date DESC",
+            (account_id,)
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+async def get_account_group_hashes(account_id, group_ids):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    group_ids = list(group_ids)
+    hashes = {}
+    async with _read() as db:
+        for i in range(0, len(group_ids), 500):
+            chunk = group_ids[i:i + 500]
+            cursor = await db.execute(
+                f"SELECT group_id, access_hash FROM account_groups WHERE account_id = ? AND group_id IN ({','.join('?' * len(chunk))}) AND access_hash IS NOT NULL",
+                [account_id] + chunk
+            )
+            for row in await cursor.fetchall():
+                hashes[row["group_id"]] = row["access_hash"]
+    return hashes
+
+async def update_account_group_hashes(account_id, hashes):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    if not hashes:
+        return
+    async with _write() as db:
+        await db.executemany(
+            '''INSERT INTO account_groups (account_id, group_id, title, access_hash)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(account_id, group_id) DO UPDATE SET access_hash = excluded.access_hash''',
+            [(account_id, group_id, title, access_hash) for group_id, (access_hash, title) in hashes.items()]
+        )
+
+async def get_group_catalog_sync(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    async with _read() as db:
+        cursor = await db.execute("SELECT * FROM account_group_sync WHERE account_id = ?", (account_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+async def upsert_account_groups(account_id, groups):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    if not groups:
+        return
+    async with _write() as db:
+        await db.executemany(
+            '''INSERT INTO account_groups (account_id, group_id, title, access_hash, members, dialog_date)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(account_id, group_id) DO UPDATE SET
+                   title = excluded.title,
+                   access_hash = excluded.access_hash,
+                   members = excluded.members,
+                   dialog_date = excluded.dialog_date''',
+            [
+                (account_id, g["id"], g["title"], g["access_hash"], g["members"], g["dialog_date"])
+                for g in groups
+            ]
+        )
+
+async def finish_group_sync(account_id, top_date, seen_ids=None):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    full = seen_ids is not None
+    now = time.time()
+    async with _write() as db:
+        if full:
+            cursor = await db.execute("SELECT group_id FROM account_groups WHERE account_id = ?", (account_id,))
+            stale = [(account_id, row[0]) for row in await cursor.fetchall() if row[0] not in seen_ids]
+            await db.executemany("DELETE FROM account_groups WHERE account_id = ? AND group_id = ?", stale)
+        await db.execute(
+            '''INSERT INTO account_group_sync (account_id, synced_at, full_synced_at, top_date)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(account_id) DO UPDATE SET
+                   synced_at = excluded.synced_at,
+                   full_synced_at = CASE WHEN ? THEN excluded.full_synced_at ELSE full_synced_at END,
+                   top_date = CASE WHEN ? THEN excluded.top_date ELSE MAX(top_date, excluded.top_date) END''',
+            (account_id, now, now if full else 0, top_date, full, full)
+        )
+
+async def invalidate_group_catalog(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    async with _write() as db:
+        await db.execute("UPDATE account_group_sync SET synced_at = 0 WHERE account_id = ?", (account_id,))
+
 async def clear_target_groups(user_id: int):
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         cursor = await db.execute("DELETE FROM target_groups WHERE user_id = ?", (user_id,))
-        await db.commit()
         return cursor.rowcount
 
 async def log_auto_reply(account_id, from_user_id: int, from_username: str = None):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        await db.execute('''
-            INSERT INTO auto_reply_logs (account_id, from_user_id, from_username, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (account_id, from_user_id, from_username, datetime.utcnow().isoformat()))
-        await db.commit()
+    await _enqueue_log("auto_reply_logs", (account_id, from_user_id, from_username, datetime.utcnow().isoformat()))
 
 async def log_group_join(account_id, group_id: int, group_title: str = None, invite_link: str = None):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        await db.execute('''
-            INSERT INTO group_join_logs (account_id, group_id, group_title, invite_link, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (account_id, group_id, group_title, invite_link, datetime.utcnow().isoformat()))
-        await db.commit()
+    await _enqueue_log("group_join_logs", (account_id, group_id, group_title, invite_link, datetime.utcnow().isoformat()))
 
 async def get_auto_reply_count(account_id):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        cursor = await db.execute("SELECT COUNT(*) FROM auto_reply_logs WHERE account_id = ?", (account_id,))
+    async with _read() as db:
+        cursor = await db.execute('''
+            SELECT
+                (SELECT COALESCE(SUM(count), 0) FROM log_daily_summary WHERE account_id = ? AND kind = 'auto_reply') +
+                (SELECT COUNT(*) FROM auto_reply_logs WHERE account_id = ?)
+        ''', (account_id, account_id))
         row = await cursor.fetchone()
         return row[0] if row else 0
 
 async def get_groups_joined_count(account_id):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        cursor = await db.execute("SELECT COUNT(*) FROM group_join_logs WHERE account_id = ?", (account_id,))
+    async with _read() as db:
+        cursor = await db.execute('''
+            SELECT
+                (SELECT COALESCE(SUM(count), 0) FROM log_daily_summary WHERE account_id = ? AND kind = 'group_join') +
+                (SELECT COUNT(*) FROM group_join_logs WHERE account_id = ?)
+        ''', (account_id, account_id))
         row = await cursor.fetchone()
         return row[0] if row else 0
 
+async def load_replied_index(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    if account_id in _replied_index:
+        return len(_replied_index[account_id])
+    async with _read() as db:
+        cursor = await db.execute("SELECT user_id FROM dm_replied_users WHERE account_id = ? ORDER BY user_id", (account_id,))
+        index = array("q")
+        while True:
+            rows = await cursor.fetchmany(config.REPLIED_INDEX_LOAD_BATCH)
+            if not rows:
+                break
+            index.extend(row[0] for row in rows)
+    _replied_index[account_id] = index
+    return len(index)
+
+def get_replied_index_stats():
+    return {
+        "accounts": len(_replied_index),
+        "entries": sum(len(index) for index in _replied_index.values()),
+        "bytes": sum(index.itemsize * len(index) for index in _replied_index.values())
+    }
+
+def _index_position(index, user_id):
+    position = bisect_left(index, user_id)
+    return position, position < len(index) and index[position] == user_id
+
 async def has_replied_to_user(account_id, user_id: int) -> bool:
     if isinstance(account_id, str):
         account_id = int(account_id)
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        cursor = await db.execute("SELECT * FROM dm_replied_users WHERE account_id = ? AND user_id = ?", (account_id, user_id))
+    index = _replied_index.get(account_id)
+    if index is not None:
+        return _index_position(index, user_id)[1]
+    async with _read() as db:
+        cursor = await db.execute("SELECT 1 FROM dm_replied_users WHERE account_id = ? AND user_id = ?", (account_id, user_id))
         return await cursor.fetchone() is not None
 
+async def claim_replied_user(account_id, user_id: int) -> bool:
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    index = _replied_index.get(account_id)
+    if index is None:
+        return not await has_replied_to_user(account_id, user_id)
+    position, found = _index_position(index, user_id)
+    if found:
+        return False
+    index.insert(position, user_id)
+    return True
+
+def release_replied_user(account_id, user_id: int):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    index = _replied_index.get(account_id)
+    if index is not None:
+        position, found = _index_position(index, user_id)
+        if found:
+            del index[position]
+
 async def mark_user_replied(account_id, user_id: int, username: str = None):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    if not await has_replied_to_user(account_id, user_id):
-        async with aiosqlite.connect(sqlite_db_path) as db:
-            await db.execute('''
-                INSERT INTO dm_replied_users (account_id, user_id, username, replied_at)
-                VALUES (?, ?, ?, ?)
-            ''', (account_id, user_id, username, datetime.utcnow().isoformat()))
-            await db.commit()
-            return True
-    return False
+    index = _replied_index.get(account_id)
+    if index is not None:
+        position, found = _index_position(index, user_id)
+        if not found:
+            index.insert(position, user_id)
+        await _enqueue_log("dm_replied_users", (account_id, user_id, username, datetime.utcnow().isoformat()))
+        return not found
+    async with _write() as db:
+        cursor = await db.execute('''
+            INSERT OR IGNORE INTO dm_replied_users (account_id, user_id, username, replied_at)
+            VALUES (?, ?, ?, ?)
+        ''', (account_id, user_id, username, datetime.utcnow().isoformat()))
+        return cursor.rowcount > 0
+
+async def get_setting(key: str, default=None):
+    async with _read() as db:
+        cursor = await db.execute("SELECT value FROM bot_settings WHERE key = ?", (key,))
+        row = await cursor.fetchone()
+        return row["value"] if row else default
+
+async def set_setting(key: str, value: str):
+    async with _write() as db:
+        await db.execute(
+            "INSERT INTO bot_settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+async def delete_setting(key: str):
+    async with _write() as db:
+        await db.execute("DELETE FROM bot_settings WHERE key = ?", (key,))
+
+async def get_broadcast_state():
+    value = await get_setting("broadcast_state")
+    return json.loads(value) if value else None
+
+async def save_broadcast_state(state: dict):
+    await set_setting("broadcast_state", json.dumps(state))
+
+async def clear_broadcast_state():
+    await delete_setting("broadcast_state")
 
 async def get_force_sub_settings():
-    async with aiosqlite.connect(sqlite_db_path) as db:
-        db.row_factory = aiosqlite.Row
+    async with _read() as db:
         cursor = await db.execute("SELECT * FROM force_sub WHERE id = 1")
         row = await cursor.fetchone()
         if row:
@@ -457,11 +1319,10 @@ async def get_force_sub_settings():
         return {"enabled": 0, "channel_id": None, "channel_link": None, "group_id": None, "group_link": None}
 
 async def update_force_sub_settings(**kwargs):
-    async with aiosqlite.connect(sqlite_db_path) as db:
+    async with _write() as db:
         set_clause = ", ".join([f"{k} = ?" for k in kwargs.keys()])
         values = list(kwargs.values())
         await db.execute(f"UPDATE force_sub SET {set_clause} WHERE id = 1", values)
-        await db.commit()
 
 async def toggle_force_sub():
     settings = await get_force_sub_settings()
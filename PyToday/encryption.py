@@ -1,11 +1,16 @@
-from cryptography.fernet import Fernet
+import asyncio
+import functools
+from cryptography.fernet import Fernet, MultiFernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 from PyToday import config
 
-def get_encryption_key():
-    key = config.ENCRYPTION_KEY.encode()
+_cipher = None
+
+@functools.lru_cache(maxsize=None)
+def derive_key(secret: str) -> bytes:
+    key = secret.encode()
     salt = b'telegram_adbot_salt'
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
@@ -16,19 +21,50 @@ def get_encryption_key():
     derived_key = base64.urlsafe_b64encode(kdf.derive(key))
     return derived_key
 
+def get_encryption_key():
+    return derive_key(config.ENCRYPTION_KEY)
+
+def get_cipher() -> MultiFernet:
+    # The first key encrypts, every key (current + ENCRYPTION_OLD_KEYS) can decrypt.
+    global _cipher
+    if _cipher is None:
+        secrets = [config.ENCRYPTION_KEY] + [k for k in config.ENCRYPTION_OLD_KEYS if k != config.ENCRYPTION_KEY]
+        _cipher = MultiFernet([Fernet(derive_key(secret)) for secret in secrets])
+    return _cipher
+
+async def init_cipher():
+    # PBKDF2 is pure CPU, derive the keys off the event loop at startup.
+    return await asyncio.to_thread(get_cipher)
+
+def reset_cipher():
+    global _cipher
+    _cipher = None
+    derive_key.cache_clear()
+
 def encrypt_data(data: str) -> str:
     if not data:
         return ""
-    fernet = Fernet(get_encryption_key())
-    encrypted = fernet.encrypt(data.encode())
+    encrypted = get_cipher().encrypt(data.encode())
     return encrypted.decode()
 
 def decrypt_data(encrypted_data: str) -> str:
     if not encrypted_data:
         return ""
     try:
-        fernet = Fernet(get_encryption_key())
-        decrypted = fernet.decrypt(encrypted_data.encode())
+        decrypted = get_cipher().decrypt(encrypted_data.encode())
         return decrypted.decode()
     except Exception:
         return encrypted_data
+
+def rotate_data(encrypted_data: str) -> str:
+    if not encrypted_data:
+        return ""
+    try:
+        Fernet(get_encryption_key()).decrypt(encrypted_data.encode())
+        return encrypted_data
+    except Exception:
+        pass
+    try:
+        return get_cipher().rotate(encrypted_data.encode()).decode()
+    except Exception:
+        return encrypted_data
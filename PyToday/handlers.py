@@ -1,5 +1,7 @@
 import asyncio
+import html
 import logging
+import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
@@ -122,6 +124,41 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=main_menu_keyboard()
         )
 
+def build_broadcast_payload(message, args):
+    reply_msg = message.reply_to_message
+    if not reply_msg:
+        return {"type": "text", "text": " ".join(args)}
+    if reply_msg.photo:
+        return {"type": "photo", "file_id": reply_msg.photo[-1].file_id, "caption": reply_msg.caption}
+    if reply_msg.video:
+        return {"type": "video", "file_id": reply_msg.video.file_id, "caption": reply_msg.caption}
+    if reply_msg.document:
+        return {"type": "document", "file_id": reply_msg.document.file_id, "caption": reply_msg.caption}
+    if reply_msg.audio:
+        return {"type": "audio", "file_id": reply_msg.audio.file_id, "caption": reply_msg.caption}
+    if reply_msg.voice:
+        return {"type": "voice", "file_id": reply_msg.voice.file_id, "caption": reply_msg.caption}
+    if reply_msg.sticker:
+        return {"type": "sticker", "file_id": reply_msg.sticker.file_id}
+    return {"type": "text", "text": reply_msg.text or reply_msg.caption}
+
+async def send_broadcast_payload(bot, chat_id, payload):
+    kind = payload["type"]
+    if kind == "photo":
+        await bot.send_photo(chat_id, payload["file_id"], caption=payload.get("caption"), parse_mode="HTML")
+    elif kind == "video":
+        await bot.send_video(chat_id, payload["file_id"], caption=payload.get("caption"), parse_mode="HTML")
+    elif kind == "document":
+        await bot.send_document(chat_id, payload["file_id"], caption=payload.get("caption"), parse_mode="HTML")
+    elif kind == "audio":
+        await bot.send_audio(chat_id, payload["file_id"], caption=payload.get("caption"), parse_mode="HTML")
+    elif kind == "voice":
+        await bot.send_voice(chat_id, payload["file_id"], caption=payload.get("caption"))
+    elif kind == "sticker":
+        await bot.send_sticker(chat_id, payload["file_id"])
+    else:
+        await bot.send_message(chat_id, payload["text"], parse_mode="HTML")
+
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
@@ -133,112 +170,147 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "<b>◈ ʙʀᴏᴀᴅᴄᴀsᴛ ᴄᴏᴍᴍᴀɴᴅ</b>\n\n"
             "<blockquote>ʀᴇᴘʟʏ ᴛᴏ ᴀ ᴍᴇssᴀɢᴇ ᴏʀ sᴇɴᴅ:\n"
-            "<code>/broadcast Your message here</code></blockquote>\n\n"
+            "<code>/broadcast Your message here</code>\n\n"
+            "ᴄᴏɴᴛɪɴᴜᴇ ᴀɴ ɪɴᴛᴇʀʀᴜᴘᴛᴇᴅ ʙʀᴏᴀᴅᴄᴀsᴛ:\n"
+            "<code>/broadcast resume</code></blockquote>\n\n"
             "<i>sᴜᴘᴘᴏʀᴛs: ᴛᴇxᴛ, ᴘʜᴏᴛᴏ, ᴠɪᴅᴇᴏ, ᴅᴏᴄᴜᴍᴇɴᴛ, ᴀᴜᴅɪᴏ</i>",
             parse_mode="HTML"
         )
         return
     
+    if context.args == ["resume"] and not update.message.reply_to_message:
+        state = await database.get_broadcast_state()
+        if not state:
+            await update.message.reply_text("<b>⊘ ɴᴏ ɪɴᴛᴇʀʀᴜᴘᴛᴇᴅ ʙʀᴏᴀᴅᴄᴀsᴛ ᴛᴏ ʀᴇsᴜᴍᴇ.</b>", parse_mode="HTML")
+            return
+    else:
+        state = {
+            "payload": build_broadcast_payload(update.message, context.args),
+            "last_id": None,
+            "sent": 0,
+            "failed": 0
+        }
+        await database.save_broadcast_state(state)
+    
     user_states[user.id] = {"state": "broadcasting", "data": {}}
     
-    all_users = await database.get_all_bot_users()
-    sent = 0
-    failed = 0
+    payload = state["payload"]
+    sent = state["sent"]
+    failed = state["failed"]
+    total_users = await database.get_bot_users_count()
     
     status_msg = await update.message.reply_text(
         f"<b>▸ ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ...</b>\n\n"
-        f"◉ ᴛᴏᴛᴀʟ: <code>{len(all_users)}</code>\n"
-        f"● sᴇɴᴛ: <code>0</code>\n"
-        f"○ ғᴀɪʟᴇᴅ: <code>0</code>",
+        f"◉ ᴛᴏᴛᴀʟ: <code>{total_users}</code>\n"
+        f"● sᴇɴᴛ: <code>{sent}</code>\n"
+        f"○ ғᴀɪʟᴇᴅ: <code>{failed}</code>",
         parse_mode="HTML"
     )
     
-    for bot_user in all_users:
-        try:
-            if update.message.reply_to_message:
-                reply_msg = update.message.reply_to_message
-                if reply_msg.photo:
-                    await context.bot.send_photo(
-                        bot_user["_id"],
-                        reply_msg.photo[-1].file_id,
-                        caption=reply_msg.caption,
-                        parse_mode="HTML"
-                    )
-                elif reply_msg.video:
-                    await context.bot.send_video(
-                        bot_user["_id"],
-                        reply_msg.video.file_id,
-                        caption=reply_msg.caption,
-                        parse_mode="HTML"
-                    )
-                elif reply_msg.document:
-                    await context.bot.send_document(
-                        bot_user["_id"],
-                        reply_msg.document.file_id,
-                        caption=reply_msg.caption,
-                        parse_mode="HTML"
-                    )
-                elif reply_msg.audio:
-                    await context.bot.send_audio(
-                        bot_user["_id"],
-                        reply_msg.audio.file_id,
-                        caption=reply_msg.caption,
-                        parse_mode="HTML"
-                    )
-                elif reply_msg.voice:
-                    await context.bot.send_voice(
-                        bot_user["_id"],
-                        reply_msg.voice.file_id,
-                        caption=reply_msg.caption
-                    )
-                elif reply_msg.sticker:
-                    await context.bot.send_sticker(
-                        bot_user["_id"],
-                        reply_msg.sticker.file_id
-                    )
-                else:
-                    await context.bot.send_message(
-                        bot_user["_id"],
-                        reply_msg.text or reply_msg.caption,
+    try:
+        async for bot_user_id in database.iter_bot_user_ids(after_id=state["last_id"]):
+            try:
+                await send_broadcast_payload(context.bot, bot_user_id, payload)
+                sent += 1
+            except Exception as e:
+                logger.error(f"Broadcast failed for {bot_user_id}: {e}")
+                failed += 1
+            
+            state.update(last_id=bot_user_id, sent=sent, failed=failed)
+            if (sent + failed) % config.BROADCAST_CHECKPOINT_EVERY == 0:
+                await database.save_broadcast_state(state)
+            
+            if (sent + failed) % 10 == 0:
+                try:
+                    await status_msg.edit_text(
+                        f"<b>▸ ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ...</b>\n\n"
+                        f"◉ ᴛᴏᴛᴀʟ: <code>{total_users}</code>\n"
+                        f"● sᴇɴᴛ: <code>{sent}</code>\n"
+                        f"○ ғᴀɪʟᴇᴅ: <code>{failed}</code>",
                         parse_mode="HTML"
                     )
-            else:
-                text = " ".join(context.args)
-                await context.bot.send_message(
-                    bot_user["_id"],
-                    text,
-                    parse_mode="HTML"
-                )
-            sent += 1
-        except Exception as e:
-            logger.error(f"Broadcast failed for {bot_user['_id']}: {e}")
-            failed += 1
-        
-        if (sent + failed) % 10 == 0:
-            try:
-                await status_msg.edit_text(
-                    f"<b>▸ ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ...</b>\n\n"
-                    f"◉ ᴛᴏᴛᴀʟ: <code>{len(all_users)}</code>\n"
-                    f"● sᴇɴᴛ: <code>{sent}</code>\n"
-                    f"○ ғᴀɪʟᴇᴅ: <code>{failed}</code>",
-                    parse_mode="HTML"
-                )
-            except:
-                pass
-        
-        await asyncio.sleep(0.05)
+                except:
+                    pass
+            
+            await asyncio.sleep(0.05)
+    except Exception as e:
+        logger.error(f"Broadcast interrupted after {sent + failed} users: {e}")
+        await database.save_broadcast_state(state)
+        if user.id in user_states:
+            del user_states[user.id]
+        await status_msg.edit_text(
+            f"<b>⊘ ʙʀᴏᴀᴅᴄᴀsᴛ ɪɴᴛᴇʀʀᴜᴘᴛᴇᴅ</b>\n\n"
+            f"● sᴇɴᴛ: <code>{sent}</code>\n"
+            f"○ ғᴀɪʟᴇᴅ: <code>{failed}</code>\n\n"
+            f"<i>sᴇɴᴅ <code>/broadcast resume</code> ᴛᴏ ᴄᴏɴᴛɪɴᴜᴇ.</i>",
+            parse_mode="HTML"
+        )
+        return
+    
+    await database.clear_broadcast_state()
     
     if user.id in user_states:
         del user_states[user.id]
     
     await status_msg.edit_text(
         f"<b>✓ ʙʀᴏᴀᴅᴄᴀsᴛ ᴄᴏᴍᴘʟᴇᴛᴇ</b>\n\n"
-        f"◉ ᴛᴏᴛᴀʟ: <code>{len(all_users)}</code>\n"
+        f"◉ ᴛᴏᴛᴀʟ: <code>{total_users}</code>\n"
         f"● sᴇɴᴛ: <code>{sent}</code>\n"
         f"○ ғᴀɪʟᴇᴅ: <code>{failed}</code>",
         parse_mode="HTML"
     )
 
+async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text("<b>⊘ ᴛʜɪs ᴄᴏᴍᴍᴀɴᴅ ɪs ᴏɴʟʏ ғᴏʀ ᴀᴅᴍɪɴs.</b>", parse_mode="HTML")
+        return
+    
+    pool = telethon_handler.get_client_pool_stats()
+    listeners = telethon_handler.get_listener_health()
+    statuses = [listener["status"] for listener in listeners]
+    replied = database.get_replied_index_stats()
+    timings = telethon_handler.get_send_timing().values()
+    sends = sum(timing["sends"] for timing in timings)
+    send_avg = sum(timing["send_seconds"] for timing in timings) / sends if sends else 0
+    scheduler = campaigns.get_scheduler_stats()
+    
+    await update.message.reply_text(
+        f"<b>◈ ʙᴏᴛ ʜᴇᴀʟᴛʜ</b>\n\n"
+        f"◉ ᴄʟɪᴇɴᴛs: <code>{pool['open']}/{pool['max']}</code> open, <code>{pool['in_use']}</code> in use, <code>{pool['pinned']}</code> pinned\n"
+        f"● ʟɪsᴛᴇɴᴇʀs: <code>{statuses.count('running')}</code> running, <code>{statuses.count('restarting')}</code> restarting, "
+        f"<code>{sum(listener['restarts'] for listener in listeners)}</code> restarts\n"
+        f"○ ʀᴇᴘʟɪᴇᴅ ɪɴᴅᴇx: <code>{replied['entries']}</code> users over <code>{replied['accounts']}</code> accounts, <code>{replied['bytes'] // 1024}</code> KB\n"
+        f"▸ sᴇɴᴅs: <code>{sends}</code> at <code>{send_avg:.2f}s</code> avg, <code>{format_duration(sum(timing['wait_seconds'] for timing in timings))}</code> parked, "
+        f"<code>{sum(timing['flood_waits'] for timing in timings)}</code> flood waits, <code>{sum(timing['slow_mode_waits'] for timing in timings)}</code> slow mode waits\n"
+        f"◈ ᴄᴀᴍᴘᴀɪɢɴs: <code>{scheduler['campaigns']}</code> running, <code>{scheduler['scheduled']}</code> scheduled, <code>{scheduler['in_flight']}</code> in flight",
+        parse_mode="HTML"
+    )
+
+async def keywords_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text("<b>⊘ ᴛʜɪs ᴄᴏᴍᴍᴀɴᴅ ɪs ᴏɴʟʏ ғᴏʀ ᴀᴅᴍɪɴs.</b>", parse_mode="HTML")
+        return
+    
+    if context.args == ["reset"]:
+        keywords = await telethon_handler.set_marketplace_keywords(None)
+    elif context.args:
+        keywords = [keyword.strip().lower() for keyword in " ".join(context.args).split(",") if keyword.strip()]
+        keywords = await telethon_handler.set_marketplace_keywords(keywords)
+    else:
+        keywords = await telethon_handler.load_marketplace_keywords()
+    
+    await update.message.reply_text(
+        f"<b>◈ ᴍᴀʀᴋᴇᴛᴘʟᴀᴄᴇ ᴋᴇʏᴡᴏʀᴅs</b>\n\n"
+        f"<blockquote><code>{html.escape(', '.join(keywords))}</code></blockquote>\n\n"
+        f"<i>sᴇᴛ: <code>/keywords shop, market, store</code>\n"
+        f"ʀᴇsᴇᴛ ᴛᴏ ᴅᴇғᴀᴜʟᴛ: <code>/keywords reset</code></i>",
+        parse_mode="HTML"
+    )
+
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = update.effective_user.id
@@ -264,7 +336,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_main_menu(query, context)
     
     elif data == "advertising_menu":
-        await show_advertising_menu(query)
+        await show_advertising_menu(query, user_id)
     
     elif data == "accounts_menu":
         await show_accounts_menu(query)
@@ -353,7 +425,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     elif data.startswith("load_grp_"):
         account_id = data.split("_")[2]
-        await load_account_groups(query, user_id, account_id, context)
+        await load_account_groups(query, user_id, account_id, context, refresh=True)
     
     elif data == "statistics":
         await show_statistics(query, user_id)
@@ -370,6 +442,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == "ad_delete_text":
         await delete_ad_text(query, user_id)
     
+    elif data == "ad_add_media":
+        await prompt_ad_media(query, user_id)
+    
+    elif data == "ad_delete_media":
+        await delete_ad_media(query, user_id)
+    
     elif data == "set_time":
         await show_time_options(query)
     
@@ -404,13 +482,24 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == "start_advertising":
         await start_advertising(query, user_id, context)
     
+    elif data == "restart_advertising":
+        await start_advertising(query, user_id, context, replace=True)
+    
     elif data == "stop_advertising":
-        context.user_data["advertising_active"] = False
-        await send_new_message(
-            query,
-            "<b>▣ ᴀᴅᴠᴇʀᴛɪsɪɴɢ sᴛᴏᴘᴘᴇᴅ</b>\n\n<blockquote>✓ <i>ʏᴏᴜʀ ᴄᴀᴍᴘᴀɪɢɴ ʜᴀs ʙᴇᴇɴ sᴛᴏᴘᴘᴇᴅ sᴜᴄᴄᴇssғᴜʟʟʏ.</i></blockquote>",
-            advertising_menu_keyboard()
-        )
+        previous = await database.get_campaign(user_id)
+        if await campaigns.stop_campaign(user_id):
+            await _remove_ad_media_file(previous["ad_media_path"] if previous else None)
+            await send_new_message(
+                query,
+                "<b>▣ ᴀᴅᴠᴇʀᴛɪsɪɴɢ sᴛᴏᴘᴘᴇᴅ</b>\n\n<blockquote>✓ <i>ʏᴏᴜʀ ᴄᴀᴍᴘᴀɪɢɴ ʜᴀs ʙᴇᴇɴ sᴛᴏᴘᴘᴇᴅ sᴜᴄᴄᴇssғᴜʟʟʏ.</i></blockquote>",
+                advertising_menu_keyboard()
+            )
+        else:
+            await send_new_message(
+                query,
+                "<b>▣ ɴᴏ ᴀᴄᴛɪᴠᴇ ᴄᴀᴍᴘᴀɪɢɴ</b>\n\n<blockquote><i>ᴛʜᴇʀᴇ ɪs ɴᴏ ʀᴜɴɴɪɴɢ ᴄᴀᴍᴘᴀɪɢɴ ᴛᴏ sᴛᴏᴘ.</i></blockquote>",
+                advertising_menu_keyboard()
+            )
     
     elif data.startswith("select_single_"):
         account_id = data.split("_")[2]
@@ -464,7 +553,39 @@ async def show_main_menu(query, context=None):
     
     await send_new_message(query, menu_text, main_menu_keyboard())
 
-async def show_advertising_menu(query):
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+def format_campaign_status(status):
+    next_send = format_duration(status["next_send_in"]) if status["next_send_in"] is not None else "loading groups"
+    return f"""<blockquote>◉ <b>Status:</b> <code>Running</code>
+📱 <b>Account:</b> <code>{status['current_account'] or '-'}</code> (<code>{status['accounts']}</code> total)
+💬 <b>Chat:</b> <code>{status['chat_index']}/{status['chat_total']}</code>
+✓ <b>Sent:</b> <code>{status['sent']}</code> | ✕ <b>Failed:</b> <code>{status['failed']}</code> | ◴ <b>Deferred:</b> <code>{status['deferred']}</code>
+⏱️ <b>Next send:</b> <code>{next_send}</code>
+⌛ <b>Cycle ETA:</b> <code>{format_duration(status['cycle_eta'])}</code>
+▸ <b>Uptime:</b> <code>{format_duration(status['uptime'])}</code></blockquote>"""
+
+async def show_advertising_menu(query, user_id):
+    status = campaigns.get_campaign_status(user_id)
+    if status:
+        adv_text = f"""
+<b>◈ ᴀᴅᴠᴇʀᴛɪsɪɴɢ ᴍᴇɴᴜ</b>
+
+━━━━━━━━━━━━━━━━━━
+{format_campaign_status(status)}
+━━━━━━━━━━━━━━━━━━
+
+<i>sᴇʟᴇᴄᴛ ᴀɴ ᴏᴘᴛɪᴏɴ:</i>
+"""
+        await send_new_message(query, adv_text, campaign_running_keyboard())
+        return
+    
     adv_text = """
 <b>◈ ᴀᴅᴠᴇʀᴛɪsɪɴɢ ᴍᴇɴᴜ</b>
 
@@ -1024,14 +1145,14 @@ async def load_groups(query, user_id):
             single_account_selection_keyboard([acc for acc in accounts if acc.get('is_logged_in')])
         )
 
-async def load_account_groups(query, user_id, account_id, context):
+async def load_account_groups(query, user_id, account_id, context, refresh=False):
     await send_new_message(
         query,
         "<b>⏳ Loading groups...</b>\n\n<blockquote><i>Please wait...</i></blockquote>",
         None
     )
     
-    result = await telethon_handler.get_groups_and_marketplaces(account_id)
+    result = await telethon_handler.get_groups_and_marketplaces(account_id, refresh=refresh)
     
     if not result["success"]:
         await send_new_message(
@@ -1042,7 +1163,6 @@ async def load_account_groups(query, user_id, account_id, context):
         return
     
     all_chats = result["groups"] + result["marketplaces"]
-    context.user_data[f"groups_{account_id}"] = all_chats
     
     groups_text = f"""
 <b>📂 ɢʀᴏᴜᴘs & ᴍᴀʀᴋᴇᴛᴘʟᴀᴄᴇs</b>
@@ -1057,13 +1177,11 @@ async def load_account_groups(query, user_id, account_id, context):
     await send_new_message(query, groups_text, groups_keyboard(all_chats, account_id))
 
 async def load_account_groups_page(query, user_id, account_id, page, context):
-    all_chats = context.user_data.get(f"groups_{account_id}", [])
+    all_chats = []
     
-    if not all_chats:
-        result = await telethon_handler.get_groups_and_marketplaces(account_id)
-        if result["success"]:
-            all_chats = result["groups"] + result["marketplaces"]
-            context.user_data[f"groups_{account_id}"] = all_chats
+    result = await telethon_handler.get_groups_and_marketplaces(account_id)
+    if result["success"]:
+        all_chats = result["groups"] + result["marketplaces"]
     
     await send_new_message(
         query,
@@ -1120,12 +1238,15 @@ async def show_ad_text_menu(query, user_id):
     user = await database.get_user(user_id)
     ad_text = user.get('ad_text') if user else None
     ad_status = "✅ Set" if ad_text else "❌ Not Set"
+    ad_media_type = user.get('ad_media_type') if user else None
+    media_status = f"✅ {ad_media_type.title()}" if ad_media_type else "❌ Not Set"
     
     menu_text = f"""
 <b>📝 ᴀᴅ ᴛᴇxᴛ ᴍᴇɴᴜ</b>
 
 ━━━━━━━━━━━━━━━━━━
-<blockquote>📝 <b>Ad Text:</b> {ad_status}</blockquote>
+<blockquote>📝 <b>Ad Text:</b> {ad_status}
+🖼️ <b>Ad Media:</b> {media_status}</blockquote>
 ━━━━━━━━━━━━━━━━━━
 
 <i>Select an option:</i>
@@ -1187,6 +1308,45 @@ async def delete_ad_text(query, user_id):
     
     await send_new_message(query, result_text, ad_text_menu_keyboard())
 
+async def prompt_ad_media(query, user_id):
+    user_states[user_id] = {"state": "awaiting_ad_media", "data": {}}
+    
+    prompt_text = """
+<b>➕ ᴀᴅᴅ ᴀᴅ ᴍᴇᴅɪᴀ</b>
+
+━━━━━━━━━━━━━━━━━━
+<blockquote><i>Send a photo, video or document now:</i></blockquote>
+
+<b>💡 Tips:</b>
+• Your ad text is used as the caption
+• Maximum size is 20 MB
+━━━━━━━━━━━━━━━━━━
+"""
+    
+    await send_new_message(query, prompt_text, ad_text_back_keyboard())
+
+async def _remove_ad_media_file(path):
+    if path and not await database.is_ad_media_in_use(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+async def delete_ad_media(query, user_id):
+    user = await database.get_user(user_id)
+    await database.update_user(user_id, ad_media_path=None, ad_media_type=None)
+    await _remove_ad_media_file(user.get('ad_media_path') if user else None)
+    
+    result_text = """
+<b>🗑️ ᴀᴅ ᴍᴇᴅɪᴀ ᴅᴇʟᴇᴛᴇᴅ</b>
+
+━━━━━━━━━━━━━━━━━━
+✅ Your ad media has been deleted.
+━━━━━━━━━━━━━━━━━━
+"""
+    
+    await send_new_message(query, result_text, ad_text_menu_keyboard())
+
 async def show_time_options(query):
     time_text = """
 <b>⏱️ sᴇᴛ ᴛɪᴍᴇ ɪɴᴛᴇʀᴠᴀʟ</b>
@@ -1390,7 +1550,11 @@ async def show_single_account_page(query, user_id, page):
         single_account_selection_keyboard(accounts, page)
     )
 
-async def start_advertising(query, user_id, context):
+async def start_advertising(query, user_id, context, replace=False):
+    if not replace and campaigns.is_campaign_running(user_id):
+        await show_advertising_menu(query, user_id)
+        return
+    
     user = await database.get_user(user_id)
     
     if not user:
@@ -1402,6 +1566,7 @@ async def start_advertising(query, user_id, context):
         return
     
     ad_text = user.get('ad_text')
+    ad_media = {"path": user['ad_media_path'], "type": user['ad_media_type']} if user.get('ad_media_path') else None
     use_forward = user.get('use_forward_mode', False)
     use_multiple = user.get('use_multiple_accounts', False)
     time_interval = user.get('time_interval', 60)
@@ -1417,7 +1582,7 @@ async def start_advertising(query, user_id, context):
         )
         return
     
-    if not use_forward and not ad_text:
+    if not use_forward and not ad_text and not ad_media:
         await send_new_message(
             query,
             "<b>❌ No ad text set</b>\n\n<blockquote><i>Please set your ad text first or enable forward mode to forward from Saved Messages.</i></blockquote>",
@@ -1455,8 +1620,6 @@ async def start_advertising(query, user_id, context):
             )
             return
     
-    context.user_data["advertising_active"] = True
-    
     mode_text = "Forward from Saved Messages" if use_forward else "Direct Send"
     target_text = f"Selected ({len(target_groups) if target_mode == 'selected' else 0} groups)" if target_mode == "selected" else "All Groups"
     
@@ -1473,35 +1636,14 @@ async def start_advertising(query, user_id, context):
 <i>Campaign is running...</i>
 """
     
-    await send_new_message(query, start_text, advertising_menu_keyboard())
+    previous = await database.get_campaign(user_id)
+    campaign = await campaigns.start_campaign(user_id, active_accounts, ad_text, time_interval, use_forward, target_mode, ad_media, replace=replace)
+    if campaign is None:
+        await show_advertising_menu(query, user_id)
+        return
+    await _remove_ad_media_file(previous["ad_media_path"] if previous else None)
     
-    asyncio.create_task(run_advertising_campaign(user_id, active_accounts, ad_text, time_interval, use_forward, target_mode, context))
-
-async def run_advertising_campaign(user_id, accounts, ad_text, delay, use_forward, target_mode, context):
-    try:
-        while context.user_data.get("advertising_active", False):
-            for account in accounts:
-                if not context.user_data.get("advertising_active", False):
-                    break
-                
-                account_id = str(account["_id"])
-                
-                if target_mode == "selected":
-                    target_groups = await database.get_target_groups(user_id)
-                    result = await telethon_handler.broadcast_to_target_groups(
-                        account_id, target_groups, ad_text, delay, use_forward
-                    )
-                else:
-                    result = await telethon_handler.broadcast_message(
-                        account_id, ad_text, delay, use_forward
-                    )
-                
-                if not context.user_data.get("advertising_active", False):
-                    break
-                
-                await asyncio.sleep(delay)
-    except Exception as e:
-        logger.error(f"Advertising campaign error: {e}")
+    await send_new_message(query, start_text, campaign_running_keyboard())
 
 async def handle_otp_input(query, user_id, data, context):
     state = user_states.get(user_id, {})
@@ -1610,6 +1752,63 @@ async def handle_otp_input(query, user_id, data, context):
             otp_keyboard()
         )
 
+async def handle_media_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    message = update.message
+    
+    if user_states.get(user_id, {}).get("state") != "awaiting_ad_media":
+        return
+    
+    if message.photo:
+        media, media_type, extension = message.photo[-1], "photo", ".jpg"
+    elif message.video:
+        media, media_type = message.video, "video"
+        extension = os.path.splitext(message.video.file_name or "")[1] or ".mp4"
+    elif message.document:
+        media, media_type = message.document, "document"
+        extension = os.path.splitext(message.document.file_name or "")[1]
+    else:
+        return
+    
+    if media.file_size and media.file_size > config.AD_MEDIA_MAX_SIZE:
+        await message.reply_text(
+            "<b>❌ File too large</b>\n\n<blockquote><i>Please send a file smaller than 20 MB.</i></blockquote>",
+            parse_mode="HTML"
+        )
+        return
+    
+    path = os.path.join(config.AD_MEDIA_DIR, f"{user_id}_{media.file_unique_id}{extension}")
+    
+    try:
+        tg_file = await context.bot.get_file(media.file_id)
+        await tg_file.download_to_drive(path)
+    except Exception as e:
+        logger.error(f"Error downloading ad media for {user_id}: {e}")
+        await message.reply_text(
+            "<b>❌ Could not save media</b>\n\n<blockquote><i>Please try again.</i></blockquote>",
+            parse_mode="HTML"
+        )
+        return
+    
+    user = await database.get_user(user_id)
+    await database.update_user(user_id, ad_media_path=path, ad_media_type=media_type)
+    await _remove_ad_media_file(user.get('ad_media_path') if user else None)
+    
+    if user_id in user_states:
+        del user_states[user_id]
+    
+    ad_text = user.get('ad_text') if user else None
+    if ad_text and telethon_handler.caption_too_long(ad_text):
+        note = f"Your ad text is longer than Telegram's {config.AD_MEDIA_CAPTION_LIMIT} character caption limit, so it will be sent as a separate message after your {media_type}."
+    else:
+        note = f"Your {media_type} will be sent with your ad text as caption."
+    
+    await message.reply_text(
+        f"<b>✅ ᴀᴅ ᴍᴇᴅɪᴀ sᴀᴠᴇᴅ</b>\n\n<blockquote><i>{note}</i></blockquote>",
+        parse_mode="HTML",
+        reply_markup=ad_text_menu_keyboard()
+    )
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     text = update.message.text
@@ -1742,8 +1941,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if user_id in user_states:
             del user_states[user_id]
         
+        user = await database.get_user(user_id)
+        note = "Your ad text has been saved."
+        if user and user.get('ad_media_path') and telethon_handler.caption_too_long(text):
+            note += f" It is longer than Telegram's {config.AD_MEDIA_CAPTION_LIMIT} character caption limit, so it will be sent as a separate message after your media."
+        
         await update.message.reply_text(
-            "<b>✅ ᴀᴅ ᴛᴇxᴛ sᴀᴠᴇᴅ</b>\n\n<blockquote><i>Your ad text has been saved.</i></blockquote>",
+            f"<b>✅ ᴀᴅ ᴛᴇxᴛ sᴀᴠᴇᴅ</b>\n\n<blockquote><i>{note}</i></blockquote>",
             parse_mode="HTML",
             reply_markup=ad_text_menu_keyboard()
         )
@@ -20,6 +20,15 @@ def advertising_menu_keyboard():
     ]
     return InlineKeyboardMarkup(keyboard)
 
+def campaign_running_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("↻ ʀᴇғʀᴇsʜ sᴛᴀᴛᴜs", callback_data="advertising_menu")],
+        [InlineKeyboardButton("⟳ ʀᴇsᴛᴀʀᴛ ᴄᴀᴍᴘᴀɪɢɴ", callback_data="restart_advertising")],
+        [InlineKeyboardButton("▣ sᴛᴏᴘ ᴀᴅᴠᴇʀᴛɪsɪɴɢ", callback_data="stop_advertising")],
+        [InlineKeyboardButton("« ʙᴀᴄᴋ", callback_data="main_menu")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
 def accounts_menu_keyboard():
     keyboard = [
         [InlineKeyboardButton("＋ ᴀᴅᴅ ᴀᴄᴄᴏᴜɴᴛ", callback_data="add_account")],
@@ -258,6 +267,8 @@ def ad_text_menu_keyboard():
         [InlineKeyboardButton("≡ sᴀᴠᴇᴅ ᴛᴇxᴛ", callback_data="ad_saved_text")],
         [InlineKeyboardButton("＋ ᴀᴅᴅ ᴛᴇxᴛ", callback_data="ad_add_text"),
          InlineKeyboardButton("✕ ᴅᴇʟᴇᴛᴇ ᴛᴇxᴛ", callback_data="ad_delete_text")],
+        [InlineKeyboardButton("＋ ᴀᴅᴅ ᴍᴇᴅɪᴀ", callback_data="ad_add_media"),
+         InlineKeyboardButton("✕ ᴅᴇʟᴇᴛᴇ ᴍᴇᴅɪᴀ", callback_data="ad_delete_media")],
         [InlineKeyboardButton("« ʙᴀᴄᴋ", callback_data="main_menu")]
     ]
     return InlineKeyboardMarkup(keyboard)
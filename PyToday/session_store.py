@@ -0,0 +1,133 @@
+import base64
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession, StringSession
+from telethon.tl.types import updates
+from PyToday import config
+from PyToday.encryption import get_cipher
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE_VERSION = 1
+
+def session_path(account_id):
+    return os.path.join(config.SESSIONS_DIR, f"account_{int(account_id)}.session")
+
+class EncryptedFileSession(MemorySession):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._dirty = False
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            data = json.loads(get_cipher().decrypt(f.read()))
+
+        self._dc_id = data["dc_id"]
+        self._server_address = data["server_address"]
+        self._port = data["port"]
+        self._takeout_id = data.get("takeout_id")
+        if data.get("auth_key"):
+            self._auth_key = AuthKey(base64.b64decode(data["auth_key"]))
+        self._entities = {tuple(row) for row in data.get("entities", [])}
+        self._update_states = {
+            int(entity_id): updates.State(
+                pts=pts,
+                qts=qts,
+                date=datetime.fromtimestamp(date, tz=timezone.utc),
+                seq=seq,
+                unread_count=unread_count
+            )
+            for entity_id, (pts, qts, date, seq, unread_count) in data.get("update_states", {}).items()
+        }
+        self._dirty = False
+
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self._dirty = True
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        if value is not self._auth_key:
+            self._dirty = True
+        self._auth_key = value
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._dirty = True
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty = True
+
+    def process_entities(self, tlo):
+        rows = set(self._entities_to_rows(tlo))
+        if not rows <= self._entities:
+            self._entities |= rows
+            self._dirty = True
+
+    def cache_file(self, md5_digest, file_size, instance):
+        super().cache_file(md5_digest, file_size, instance)
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "version": SESSION_FILE_VERSION,
+            "dc_id": self._dc_id,
+            "server_address": self._server_address,
+            "port": self._port,
+            "takeout_id": self._takeout_id,
+            "auth_key": base64.b64encode(self._auth_key.key).decode() if self._auth_key else None,
+            "entities": [list(row) for row in self._entities],
+            "update_states": {
+                str(entity_id): [state.pts, state.qts, int(state.date.timestamp()) if state.date else 0, state.seq, state.unread_count]
+                for entity_id, state in self._update_states.items()
+            }
+        }
+        payload = get_cipher().encrypt(json.dumps(data, separators=(",", ":")).encode())
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def close(self):
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Error saving session {self.path}: {e}")
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def open_session(account_id, session_string):
+    session = EncryptedFileSession(session_path(account_id))
+    string_session = StringSession(session_string)
+
+    if os.path.exists(session.path):
+        try:
+            session.load()
+            if session.auth_key and string_session.auth_key and session.auth_key.key == string_session.auth_key.key:
+                return session
+            logger.info(f"Session file for account {account_id} belongs to an older login, rebuilding it")
+        except Exception as e:
+            logger.warning(f"Could not read session file for account {account_id}, rebuilding it: {e}")
+        session = EncryptedFileSession(session.path)
+
+    session.set_dc(string_session.dc_id, string_session.server_address, string_session.port)
+    session.auth_key = string_session.auth_key
+    session.save()
+    return session
+
+def delete_session(account_id):
+    EncryptedFileSession(session_path(account_id)).delete()
@@ -1,20 +1,231 @@
 import asyncio
+import functools
 import logging
 import re
-from telethon import TelegramClient, events
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from telethon import TelegramClient, events, utils
+from telethon.extensions import html
 from telethon.sessions import StringSession
 from telethon.tl.functions.account import UpdateProfileRequest
 from telethon.tl.functions.messages import ForwardMessagesRequest, ImportChatInviteRequest
-from telethon.tl.functions.channels import JoinChannelRequest
-from telethon.tl.types import Channel, Chat, InputPeerChannel, InputPeerSelf
+from telethon.tl.functions.messages import GetChatsRequest, UploadMediaRequest
+from telethon.tl.functions.channels import GetChannelsRequest, JoinChannelRequest
+from telethon.tl.types import Channel, Chat, InputChannel, InputPeerChannel, InputPeerChat, InputPeerSelf, PeerChannel, PeerChat
+from telethon.tl.types import InputMediaUploadedDocument, InputMediaUploadedPhoto
+from telethon.tl.types import InputMessageEntityMentionName, MessageEntityMentionName, MessageEntityTextUrl
+from telethon.errors import FileReferenceExpiredError, FloodWaitError, MessageIdInvalidError, MessageIdsEmptyError, RPCError, SlowModeWaitError
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError, PhoneCodeExpiredError, PasswordHashInvalidError, UserAlreadyParticipantError, InviteHashExpiredError, InviteHashInvalidError
-from datetime import datetime
 from PyToday import *
+from PyToday.session_store import open_session
 
 
 logger = logging.getLogger(__name__)
 active_clients = {}
 
+_client_pool = OrderedDict()
+_pool_cond = asyncio.Condition()
+_reaper_task = None
+_saved_message_ids = {}
+_marketplace_pattern = None
+_media_cache = {}
+_account_parked_until = {}
+_chat_parked_until = {}
+_send_timing = {}
+_MENTION_URL = re.compile(r'^@|\+|tg://user\?id=(\d+)')
+
+class AccountUnavailableError(Exception):
+    pass
+
+async def _disconnect(client):
+    try:
+        await client.disconnect()
+    except Exception as e:
+        logger.warning(f"Error disconnecting client: {e}")
+
+def _pop_idle_client(idle_before=None):
+    for account_id, entry in _client_pool.items():
+        if entry["pinned"] or entry["users"]:
+            continue
+        if idle_before is not None and entry["last_used"] > idle_before:
+            continue
+        return _client_pool.pop(account_id)
+    return None
+
+async def _ensure_connected(account_id, entry):
+    credentials = await database.get_account_credentials(account_id)
+    if not credentials:
+        raise AccountUnavailableError("Account not logged in")
+    
+    api_id, api_hash, session_string = credentials
+    client = entry["client"]
+    
+    if client is not None and entry["session_string"] != session_string:
+        await _disconnect(client)
+        client = entry["client"] = None
+    
+    if client is None:
+        client = TelegramClient(open_session(account_id, session_string), int(api_id), api_hash)
+        await client.connect()
+        if not await client.is_user_authorized():
+            await _disconnect(client)
+            raise AccountUnavailableError("Session expired")
+        client.add_event_handler(_saved_messages_watcher(account_id), events.NewMessage(outgoing=True))
+        entry["client"] = client
+        entry["session_string"] = session_string
+    elif not client.is_connected():
+        await client.connect()
+    
+    return client
+
+@asynccontextmanager
+async def account_client(account_id):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    
+    async with _pool_cond:
+        while account_id not in _client_pool and len(_client_pool) >= config.TELETHON_MAX_CLIENTS:
+            evicted = _pop_idle_client()
+            if evicted is None:
+                if not any(entry["users"] for entry in _client_pool.values()):
+                    logger.warning(f"Client pool full of pinned listeners, opening client {len(_client_pool) + 1} over the cap")
+                    break
+                await _pool_cond.wait()
+            elif evicted["client"] is not None:
+                await _disconnect(evicted["client"])
+        
+        entry = _client_pool.get(account_id)
+        if entry is None:
+            entry = {
+                "client": None,
+                "session_string": None,
+                "lock": asyncio.Lock(),
+                "users": 0,
+                "pinned": False,
+                "last_used": time.monotonic()
+            }
+            _client_pool[account_id] = entry
+        _client_pool.move_to_end(account_id)
+        entry["users"] += 1
+    
+    _start_reaper()
+    
+    try:
+        async with entry["lock"]:
+            yield await _ensure_connected(account_id, entry)
+    finally:
+        async with _pool_cond:
+            entry["users"] -= 1
+            entry["last_used"] = time.monotonic()
+            if entry["client"] is None and not entry["users"] and _client_pool.get(account_id) is entry:
+                del _client_pool[account_id]
+            _pool_cond.notify_all()
+
+def _saved_messages_watcher(account_id):
+    async def on_outgoing_message(event):
+        me = await event.client.get_me(input_peer=True)
+        if event.chat_id == me.user_id:
+            _saved_message_ids[account_id] = event.message.id
+            await database.update_account(account_id, saved_message_id=event.message.id)
+    return on_outgoing_message
+
+async def _pin_saved_message(account_id, client):
+    messages = await client.get_messages(InputPeerSelf(), limit=1)
+    message_id = messages[0].id if messages else None
+    _saved_message_ids[account_id] = message_id
+    await database.update_account(account_id, saved_message_id=message_id)
+    return message_id
+
+async def _get_saved_message_id(account_id, client):
+    if account_id not in _saved_message_ids:
+        account = await database.get_account(account_id)
+        if account and account.get("saved_message_id"):
+            _saved_message_ids[account_id] = account["saved_message_id"]
+        else:
+            return await _pin_saved_message(account_id, client)
+    return _saved_message_ids[account_id]
+
+async def _forward_saved_message(account_id, client, entity):
+    message_id = await _get_saved_message_id(account_id, client)
+    if message_id is None:
+        return False
+    try:
+        await client.forward_messages(entity, message_id, InputPeerSelf())
+    except (MessageIdInvalidError, MessageIdsEmptyError):
+        message_id = await _pin_saved_message(account_id, client)
+        if message_id is None:
+            return False
+        await client.forward_messages(entity, message_id, InputPeerSelf())
+    return True
+
+async def _resolve_peer(client, chat_id, access_hash=None):
+    try:
+        return client.session.get_input_entity(chat_id)
+    except ValueError:
+        pass
+    if access_hash is not None:
+        return InputPeerChannel(channel_id=chat_id, access_hash=access_hash)
+    try:
+        return await client.get_input_entity(chat_id)
+    except ValueError:
+        return chat_id
+
+def _set_pinned(account_id, pinned):
+    entry = _client_pool.get(int(account_id))
+    if entry is not None:
+        entry["pinned"] = pinned
+        entry["last_used"] = time.monotonic()
+
+async def _reap_idle_clients():
+    while True:
+        await asyncio.sleep(min(60, config.TELETHON_CLIENT_IDLE_TTL))
+        idle_before = time.monotonic() - config.TELETHON_CLIENT_IDLE_TTL
+        evicted = []
+        async with _pool_cond:
+            entry = _pop_idle_client(idle_before)
+            while entry is not None:
+                evicted.append(entry)
+                entry = _pop_idle_client(idle_before)
+            if evicted:
+                _pool_cond.notify_all()
+        for entry in evicted:
+            if entry["client"] is not None:
+                await _disconnect(entry["client"])
+        if evicted:
+            logger.info(f"Closed {len(evicted)} idle Telegram clients, {len(_client_pool)} still open")
+
+def _start_reaper():
+    global _reaper_task
+    if _reaper_task is None or _reaper_task.done():
+        _reaper_task = asyncio.create_task(_reap_idle_clients())
+
+def get_client_pool_stats():
+    return {
+        "open": sum(1 for entry in _client_pool.values() if entry["client"] is not None),
+        "pinned": sum(1 for entry in _client_pool.values() if entry["pinned"]),
+        "in_use": sum(1 for entry in _client_pool.values() if entry["users"]),
+        "max": config.TELETHON_MAX_CLIENTS
+    }
+
+async def close_client_pool():
+    global _reaper_task, _pool_cond
+    if _reaper_task is not None:
+        _reaper_task.cancel()
+        await asyncio.gather(_reaper_task, return_exceptions=True)
+        _reaper_task = None
+    listeners = list(active_clients.values())
+    active_clients.clear()
+    await _stop_listeners(listeners)
+    async with _pool_cond:
+        entries = list(_client_pool.values())
+        _client_pool.clear()
+        _pool_cond.notify_all()
+    _pool_cond = asyncio.Condition()
+    for entry in entries:
+        if entry["client"] is not None:
+            await _disconnect(entry["client"])
+
 async def create_client(api_id, api_hash, session_string=None):
     if session_string:
         client = TelegramClient(StringSession(session_string), api_id, api_hash)
@@ -127,72 +338,143 @@ async def verify_2fa_password(api_id, api_hash, password, session_string):
         await client.disconnect()
         return {"success": False, "error": str(e)}
 
-async def get_groups_and_marketplaces(account_id):
+@functools.lru_cache(maxsize=8)
+def compile_marketplace_pattern(keywords):
+    # A keyword that contains another keyword can never change the result.
+    keywords = {keyword for keyword in keywords if keyword}
+    keywords = [keyword for keyword in keywords if not any(other != keyword and other in keyword for other in keywords)]
+    if not keywords:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(re.escape(keyword) for keyword in sorted(keywords)))
+
+def _current_marketplace_pattern():
+    return _marketplace_pattern or compile_marketplace_pattern(tuple(config.MARKETPLACE_KEYWORDS))
+
+def is_marketplace_title(title, pattern=None):
+    return (pattern or _current_marketplace_pattern()).search(title.lower()) is not None
+
+def classify_titles(titles, pattern=None):
+    search = (pattern or _current_marketplace_pattern()).search
+    return [search(title.lower()) is not None for title in titles]
+
+async def load_marketplace_keywords():
+    global _marketplace_pattern
+    value = await database.get_setting("marketplace_keywords")
+    if value is not None:
+        keywords = [keyword.strip().lower() for keyword in value.split(",") if keyword.strip()]
+    else:
+        keywords = config.MARKETPLACE_KEYWORDS
+    _marketplace_pattern = compile_marketplace_pattern(tuple(keywords))
+    return keywords
+
+async def set_marketplace_keywords(keywords):
+    if keywords is None:
+        await database.delete_setting("marketplace_keywords")
+    else:
+        await database.set_setting("marketplace_keywords", ",".join(keywords))
+    return await load_marketplace_keywords()
+
+def _dialog_record(dialog):
+    entity = dialog.entity
+    
+    if isinstance(entity, Channel):
+        if entity.broadcast:
+            return None
+        if not entity.megagroup:
+            return None
+    
+    if not isinstance(entity, (Channel, Chat)):
+        return None
+    
+    return {
+        'id': entity.id,
+        'title': dialog.title or "Unknown",
+        'members': getattr(entity, 'participants_count', 0) or 0,
+        'access_hash': getattr(entity, 'access_hash', None),
+        'dialog_date': int(dialog.date.timestamp()) if dialog.date else 0
+    }
+
+async def _sync_group_catalog(account_id, top_date=None):
+    full = top_date is None
+    seen_ids = set() if full else None
+    chunk = []
+    updated = 0
+    newest = 0
+    
+    async with account_client(account_id) as client:
+        async for dialog in client.iter_dialogs(ignore_migrated=True):
+            date = int(dialog.date.timestamp()) if dialog.date else 0
+            if not full and not dialog.pinned and date <= top_date:
+                break
+            newest = max(newest, date)
+            record = _dialog_record(dialog)
+            if record is None:
+                continue
+            chunk.append(record)
+            if full:
+                seen_ids.add(record["id"])
+            if len(chunk) >= config.GROUP_CATALOG_CHUNK_SIZE:
+                await database.upsert_account_groups(account_id, chunk)
+                updated += len(chunk)
+                chunk = []
+    
+    await database.upsert_account_groups(account_id, chunk)
+    updated += len(chunk)
+    await database.finish_group_sync(account_id, newest, seen_ids)
+    logger.info(f"{'Full' if full else 'Incremental'} group catalog sync for account {account_id}: {updated} groups updated")
+
+async def get_groups_and_marketplaces(account_id, refresh=False):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
         
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
+        sync = await database.get_group_catalog_sync(account_id)
+        now = time.time()
+        synced = False
         
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
+        try:
+            if refresh or not sync or now - sync["full_synced_at"] >= config.GROUP_CATALOG_FULL_REFRESH:
+                await _sync_group_catalog(account_id)
+                synced = True
+            elif now - sync["synced_at"] >= config.GROUP_CATALOG_TTL:
+                await _sync_group_catalog(account_id, top_date=sync["top_date"])
+                synced = True
+        except AccountUnavailableError:
+            raise
+        except Exception as e:
+            if not sync:
+                raise
+            logger.warning(f"Group catalog refresh failed for account {account_id}, serving cached catalog: {e}")
         
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired. Please login again."}
+        if _marketplace_pattern is None:
+            await load_marketplace_keywords()
         
         groups = []
         marketplaces = []
         
-        dialogs = await client.get_dialogs(limit=500)
-        
-        for dialog in dialogs:
-            entity = dialog.entity
+        rows = await database.get_account_groups(account_id)
+        flags = classify_titles([row["title"] for row in rows])
+        
+        for row, is_marketplace in zip(rows, flags):
+            item = {
+                'id': row["group_id"],
+                'title': row["title"],
+                'is_marketplace': is_marketplace,
+                'members': row["members"],
+                'access_hash': row["access_hash"]
+            }
             
-            if isinstance(entity, Channel):
-                if entity.broadcast:
-                    continue
-                if not entity.megagroup:
-                    continue
-            
-            if isinstance(entity, (Channel, Chat)):
-                is_marketplace = False
-                title = dialog.title or "Unknown"
-                title_lower = title.lower()
-                
-                marketplace_keywords = ['market', 'shop', 'store', 'sell', 'buy', 'trade', 'deal', 'bazaar', 'mall', 'marketplace', 'bazar', 'selling', 'buying']
-                for keyword in marketplace_keywords:
-                    if keyword in title_lower:
-                        is_marketplace = True
-                        break
-                
-                access_hash = getattr(entity, 'access_hash', None)
-                
-                item = {
-                    'id': entity.id,
-                    'title': title,
-                    'is_marketplace': is_marketplace,
-                    'members': getattr(entity, 'participants_count', 0) or 0,
-                    'access_hash': access_hash
-                }
-                
-                if is_marketplace:
-                    marketplaces.append(item)
-                else:
-                    groups.append(item)
-        
-        await client.disconnect()
+            if is_marketplace:
+                marketplaces.append(item)
+            else:
+                groups.append(item)
         
-        await database.create_or_update_stats(
-            account_id,
-            groups_count=len(groups),
-            marketplaces_count=len(marketplaces)
-        )
+        if synced:
+            await database.create_or_update_stats(
+                account_id,
+                groups_count=len(groups),
+                marketplaces_count=len(marketplaces)
+            )
         
         return {
             "success": True,
@@ -200,6 +482,9 @@ async def get_groups_and_marketplaces(account_id):
             "marketplaces": marketplaces,
             "total": len(groups) + len(marketplaces)
         }
+    except AccountUnavailableError as e:
+        error = "Session expired. Please login again." if str(e) == "Session expired" else str(e)
+        return {"success": False, "error": error}
     except Exception as e:
         logger.error(f"Error getting groups: {e}")
         return {"success": False, "error": str(e)}
@@ -208,126 +493,132 @@ async def get_saved_message_id(account_id):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return None
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return None
-        
-        me = await client.get_me()
-        messages = await client.get_messages(me, limit=1)
-        
-        await client.disconnect()
-        
-        if messages and len(messages) > 0:
-            return messages[0].id
+        async with account_client(account_id) as client:
+            return await _pin_saved_message(account_id, client)
+    except AccountUnavailableError:
         return None
     except Exception as e:
         logger.error(f"Error getting saved message: {e}")
         return None
 
+def _chat_key(chat_id):
+    try:
+        return utils.get_peer_id(chat_id)
+    except (TypeError, ValueError):
+        return chat_id
+
+def _timing(account_id):
+    timing = _send_timing.get(account_id)
+    if timing is None:
+        timing = _send_timing[account_id] = {"sends": 0, "send_seconds": 0.0, "wait_seconds": 0.0, "flood_waits": 0, "slow_mode_waits": 0}
+    return timing
+
+def _record_send(account_id, started):
+    timing = _timing(account_id)
+    timing["sends"] += 1
+    timing["send_seconds"] += time.monotonic() - started
+
+def _park(account_id, chat_id, error):
+    deadline = time.monotonic() + error.seconds
+    timing = _timing(account_id)
+    if isinstance(error, SlowModeWaitError):
+        _chat_parked_until[(account_id, _chat_key(chat_id))] = deadline
+        timing["slow_mode_waits"] += 1
+        logger.warning(f"Slow mode in chat {_chat_key(chat_id)} for account {account_id}, parked for {error.seconds}s")
+    else:
+        _account_parked_until[account_id] = max(deadline, _account_parked_until.get(account_id, 0))
+        timing["flood_waits"] += 1
+        logger.warning(f"Flood wait for account {account_id}, parked for {error.seconds}s")
+    return {"success": False, "error": str(error), "retry_after": error.seconds}
+
+def get_send_delay(account_id, chat_id=None):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
+    now = time.monotonic()
+    delay = 0
+    keys = [(_account_parked_until, account_id)]
+    if chat_id is not None:
+        keys.append((_chat_parked_until, (account_id, _chat_key(chat_id))))
+    for parked, key in keys:
+        deadline = parked.get(key)
+        if deadline is None:
+            continue
+        if deadline <= now:
+            del parked[key]
+        else:
+            delay = max(delay, deadline - now)
+    return delay
+
+def record_send_wait(account_id, seconds):
+    _timing(int(account_id))["wait_seconds"] += seconds
+
+def _parked_result(account_id, chat_id):
+    delay = get_send_delay(account_id, chat_id)
+    if delay > 0:
+        return {"success": False, "error": f"Waiting {delay:.0f}s for Telegram flood limit", "retry_after": delay}
+    return None
+
+def get_send_timing(account_id=None):
+    if account_id is not None:
+        return dict(_timing(int(account_id)))
+    return {account_id: dict(timing) for account_id, timing in _send_timing.items()}
+
 async def forward_from_saved_messages(account_id, chat_id, access_hash=None):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
-        me = await client.get_me()
-        messages = await client.get_messages(me, limit=1)
-        
-        if not messages or len(messages) == 0:
-            await client.disconnect()
-            return {"success": False, "error": "No message in saved messages. Please add a message to your Saved Messages first."}
-        
-        source_message = messages[0]
-        
-        try:
-            entity = await client.get_entity(chat_id)
-        except ValueError:
-            if access_hash is not None:
-                entity = InputPeerChannel(channel_id=chat_id, access_hash=access_hash)
-            else:
-                entity = chat_id
-        
-        await client.forward_messages(entity, source_message.id, me)
-        
-        await client.disconnect()
+        parked = _parked_result(account_id, chat_id)
+        if parked:
+            return parked
+        started = time.monotonic()
+        async with account_client(account_id) as client:
+            entity = await _resolve_peer(client, chat_id, access_hash)
+            
+            if not await _forward_saved_message(account_id, client, entity):
+                return {"success": False, "error": "No message in saved messages. Please add a message to your Saved Messages first."}
+        _record_send(account_id, started)
         
-        await database.update_account(account_id, last_used=datetime.utcnow())
+        await database.mark_account_used(account_id)
         await database.increment_stats(account_id, "messages_sent")
         
         return {"success": True}
+    except AccountUnavailableError as e:
+        return {"success": False, "error": str(e)}
+    except (FloodWaitError, SlowModeWaitError) as e:
+        return _park(account_id, chat_id, e)
     except Exception as e:
         logger.error(f"Error forwarding from saved: {e}")
         await database.increment_stats(account_id, "messages_failed")
         return {"success": False, "error": str(e)}
 
-async def send_message_to_chat(account_id, chat_id, message, access_hash=None, use_forward=False):
+async def send_message_to_chat(account_id, chat_id, message, access_hash=None, use_forward=False, media=None):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
-        try:
-            entity = await client.get_entity(chat_id)
-        except ValueError:
-            if access_hash is not None:
-                entity = InputPeerChannel(channel_id=chat_id, access_hash=access_hash)
-            else:
-                entity = chat_id
-        
-        if use_forward:
-            me = await client.get_me()
-            messages = await client.get_messages(me, limit=1)
+        parked = _parked_result(account_id, chat_id)
+        if parked:
+            return parked
+        started = time.monotonic()
+        async with account_client(account_id) as client:
+            entity = await _resolve_peer(client, chat_id, access_hash)
             
-            if messages and len(messages) > 0:
-                await client.forward_messages(entity, messages[0].id, me)
+            if use_forward:
+                if not await _forward_saved_message(account_id, client, entity):
+                    await _send_compiled(client, entity, message)
+            elif media:
+                await _send_media(account_id, client, entity, media, message)
             else:
-                await client.send_message(entity, message)
-        else:
-            await client.send_message(entity, message)
+                await _send_compiled(client, entity, message)
+        _record_send(account_id, started)
         
-        await client.disconnect()
-        
-        await database.update_account(account_id, last_used=datetime.utcnow())
+        await database.mark_account_used(account_id)
         await database.increment_stats(account_id, "messages_sent")
         
         return {"success": True}
+    except AccountUnavailableError as e:
+        return {"success": False, "error": str(e)}
+    except (FloodWaitError, SlowModeWaitError) as e:
+        return _park(account_id, chat_id, e)
     except Exception as e:
         await database.increment_stats(account_id, "messages_failed")
         return {"success": False, "error": str(e)}
@@ -336,25 +627,9 @@ async def save_message_to_saved(account_id, message):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
-        me = await client.get_me()
-        sent_msg = await client.send_message(me, message)
-        
-        await client.disconnect()
+        async with account_client(account_id) as client:
+            me = await client.get_me()
+            sent_msg = await client.send_message(me, message)
         
         return {"success": True, "message_id": sent_msg.id}
     except Exception as e:
@@ -365,114 +640,215 @@ async def forward_message_to_chat(account_id, chat_id, from_peer, message_id, ac
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
-        try:
-            entity = await client.get_entity(chat_id)
-        except ValueError:
-            if access_hash is not None:
-                entity = InputPeerChannel(channel_id=chat_id, access_hash=access_hash)
-            else:
-                entity = chat_id
-        
-        await client.forward_messages(entity, message_id, from_peer)
-        
-        await client.disconnect()
+        parked = _parked_result(account_id, chat_id)
+        if parked:
+            return parked
+        started = time.monotonic()
+        async with account_client(account_id) as client:
+            entity = await _resolve_peer(client, chat_id, access_hash)
+            
+            await client.forward_messages(entity, message_id, from_peer)
+        _record_send(account_id, started)
         
-        await database.update_account(account_id, last_used=datetime.utcnow())
+        await database.mark_account_used(account_id)
         await database.increment_stats(account_id, "messages_sent")
         
         return {"success": True}
+    except AccountUnavailableError as e:
+        return {"success": False, "error": str(e)}
+    except (FloodWaitError, SlowModeWaitError) as e:
+        return _park(account_id, chat_id, e)
     except Exception as e:
         await database.increment_stats(account_id, "messages_failed")
         return {"success": False, "error": str(e)}
 
-async def broadcast_to_target_groups(account_id, target_groups, message, delay=60, use_forward=False):
-    sent = 0
-    failed = 0
-    
-    if isinstance(account_id, str):
-        account_id = int(account_id)
+@functools.lru_cache(maxsize=256)
+def compile_message(text):
+    # Same parsing TelegramClient.send_message does for parse_mode="html",
+    # done once per distinct ad text instead of once per send. User mentions
+    # depend on the sending account, so _resolve_mentions handles them per send.
+    message, entities = html.parse(text)
+    entities = tuple(entity for entity in entities if entity.length)
+    if text and not message and not entities:
+        raise ValueError("Failed to parse message")
+    return message, entities
+
+def caption_too_long(text):
+    try:
+        caption = compile_message(text)[0]
+    except ValueError:
+        return False
+    return len(caption.encode("utf-16-le")) // 2 > config.AD_MEDIA_CAPTION_LIMIT
+
+async def _resolve_mentions(client, entities):
+    entities = list(entities)
+    for i in reversed(range(len(entities))):
+        entity = entities[i]
+        if isinstance(entity, MessageEntityTextUrl):
+            match = _MENTION_URL.match(entity.url)
+            if not match:
+                continue
+            user = int(match.group(1)) if match.group(1) else entity.url
+        elif isinstance(entity, (MessageEntityMentionName, InputMessageEntityMentionName)):
+            user = entity.user_id
+        else:
+            continue
+        try:
+            entities[i] = InputMessageEntityMentionName(entity.offset, entity.length, await client.get_input_entity(user))
+        except (ValueError, TypeError):
+            del entities[i]
+    return entities
+
+async def _send_compiled(client, entity, text):
+    message, entities = compile_message(text)
+    return await client.send_message(entity, message, formatting_entities=await _resolve_mentions(client, entities))
+
+async def _upload_media(client, media):
+    uploaded = await client.upload_file(media["path"])
+    if media["type"] == "photo":
+        input_media = InputMediaUploadedPhoto(file=uploaded)
+    else:
+        attributes, mime_type = utils.get_attributes(media["path"], supports_streaming=media["type"] == "video")
+        input_media = InputMediaUploadedDocument(
+            file=uploaded,
+            mime_type=mime_type,
+            attributes=attributes,
+            force_file=media["type"] == "document"
+        )
+    result = await client(UploadMediaRequest(peer=InputPeerSelf(), media=input_media))
+    return utils.get_input_media(result)
+
+async def _get_media(account_id, client, media, refresh=False):
+    key = (account_id, media["path"])
+    if refresh or key not in _media_cache:
+        for stale in [k for k in _media_cache if k[0] == account_id and k != key]:
+            del _media_cache[stale]
+        _media_cache[key] = await _upload_media(client, media)
+        logger.info(f"Uploaded ad media {media['path']} for account {account_id}")
+    return _media_cache[key]
+
+async def _send_media(account_id, client, entity, media, text):
+    if text and caption_too_long(text):
+        await _send_media(account_id, client, entity, media, None)
+        return await _send_compiled(client, entity, text)
     
-    for group in target_groups:
+    caption, entities = compile_message(text) if text else ("", ())
+    entities = await _resolve_mentions(client, entities)
+    input_media = await _get_media(account_id, client, media)
+    try:
+        return await client.send_file(entity, input_media, caption=caption, formatting_entities=entities)
+    except FileReferenceExpiredError:
+        input_media = await _get_media(account_id, client, media, refresh=True)
+        return await client.send_file(entity, input_media, caption=caption, formatting_entities=entities)
+
+def _split_group_id(group_id):
+    if group_id < 0:
+        return utils.resolve_id(group_id)
+    return group_id, None
+
+def _is_peer_error(error):
+    return isinstance(error, RPCError) and not isinstance(error, (FloodWaitError, SlowModeWaitError))
+
+async def _request_chunks(account_id, client, ids, make_request):
+    chunks = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+    results = []
+    while chunks:
+        chunk = chunks.pop()
         try:
-            group_id = group.get('group_id') or group.get('id')
-            access_hash = group.get('access_hash')
-            
-            if use_forward:
-                result = await forward_from_saved_messages(account_id, group_id, access_hash)
-            else:
-                result = await send_message_to_chat(account_id, group_id, message, access_hash, use_forward=False)
-            
-            if result["success"]:
-                sent += 1
-            else:
-                failed += 1
-                logger.error(f"Failed to send to group {group_id}: {result.get('error')}")
-            
-            await asyncio.sleep(delay)
+            results.append((chunk, await client(make_request(chunk)), None))
         except Exception as e:
-            logger.error(f"Broadcast error for group: {e}")
-            failed += 1
-    
-    await database.create_or_update_stats(account_id, last_broadcast=datetime.utcnow())
-    
-    return {
-        "success": True,
-        "sent": sent,
-        "failed": failed,
-        "total": len(target_groups)
-    }
+            if len(chunk) > 1 and _is_peer_error(e):
+                logger.warning(f"Batch resolve failed for account {account_id}, resolving {len(chunk)} ids one by one: {e}")
+                chunks.extend([raw_id] for raw_id in chunk)
+            else:
+                results.append((chunk, None, e))
+    return results
 
-async def broadcast_message(account_id, message, delay=60, use_forward=False):
-    result = await get_groups_and_marketplaces(account_id)
-    if not result["success"]:
-        return result
+async def resolve_target_peers(account_id, group_ids):
+    if isinstance(account_id, str):
+        account_id = int(account_id)
     
-    all_chats = result["groups"] + result["marketplaces"]
-    sent = 0
-    failed = 0
+    peers = {}
+    channels = {}
+    chats = []
+    fresh_hashes = {}
+    split_ids = [_split_group_id(group_id) for group_id in group_ids]
+    hashes = await database.get_account_group_hashes(account_id, [raw_id for raw_id, kind in split_ids])
     
-    for chat in all_chats:
-        try:
-            if use_forward:
-                send_result = await forward_from_saved_messages(account_id, chat["id"], chat.get("access_hash"))
-            else:
-                send_result = await send_message_to_chat(account_id, chat["id"], message, chat.get("access_hash"))
-            
-            if send_result["success"]:
-                sent += 1
-            else:
-                failed += 1
-            
-            await asyncio.sleep(delay)
-        except Exception as e:
-            logger.error(f"Broadcast error: {e}")
-            failed += 1
+    async with account_client(account_id) as client:
+        for raw_id, kind in split_ids:
+            if kind is not PeerChat:
+                access_hash = hashes.get(raw_id)
+                if access_hash is None:
+                    try:
+                        cached = client.session.get_input_entity(utils.get_peer_id(PeerChannel(raw_id)))
+                        access_hash = cached.access_hash
+                    except (ValueError, AttributeError):
+                        pass
+                if access_hash is not None:
+                    channels[raw_id] = access_hash
+                    continue
+            if kind is not PeerChannel:
+                chats.append(raw_id)
+        
+        channel_results = await _request_chunks(
+            account_id, client, list(channels),
+            lambda chunk: GetChannelsRequest([InputChannel(raw_id, channels[raw_id]) for raw_id in chunk])
+        )
+        for chunk, result, error in channel_results:
+            if error is not None:
+                if _is_peer_error(error):
+                    peers[chunk[0]] = None
+                    continue
+                logger.warning(f"Batch channel resolve failed for account {account_id}: {error}")
+                for raw_id in chunk:
+                    peers[raw_id] = InputPeerChannel(raw_id, channels[raw_id])
+                continue
+            for raw_id in chunk:
+                peers[raw_id] = None
+            for chat in result.chats:
+                if isinstance(chat, Channel) and not chat.left:
+                    peers[chat.id] = utils.get_input_peer(chat)
+                    if chat.megagroup and chat.access_hash != hashes.get(chat.id):
+                        fresh_hashes[chat.id] = (chat.access_hash, chat.title)
+        
+        for chunk, result, error in await _request_chunks(account_id, client, chats, GetChatsRequest):
+            if error is not None:
+                if _is_peer_error(error):
+                    peers[chunk[0]] = None
+                    continue
+                logger.warning(f"Batch chat resolve failed for account {account_id}: {error}")
+                continue
+            for chat in result.chats:
+                if isinstance(chat, Chat) and not chat.deactivated:
+                    peers[chat.id] = InputPeerChat(chat.id)
     
+    await database.update_account_group_hashes(account_id, fresh_hashes)
+    return peers
+
+async def get_target_chats(account_id, target_groups):
     if isinstance(account_id, str):
         account_id = int(account_id)
-    await database.create_or_update_stats(account_id, last_broadcast=datetime.utcnow())
     
-    return {
-        "success": True,
-        "sent": sent,
-        "failed": failed,
-        "total": len(all_chats)
-    }
+    try:
+        peers = await resolve_target_peers(account_id, [group.get('group_id') or group.get('id') for group in target_groups])
+    except Exception as e:
+        logger.warning(f"Could not pre-resolve target groups for account {account_id}: {e}")
+        peers = {}
+    
+    chats = {}
+    skipped = []
+    for group in target_groups:
+        group_id = group.get('group_id') or group.get('id')
+        raw_id = _split_group_id(group_id)[0]
+        peer = group_id
+        if raw_id in peers:
+            if peers[raw_id] is None:
+                skipped.append(group_id)
+                continue
+            peer = peers[raw_id]
+        chats[group_id] = (peer, group.get('access_hash'))
+    return chats, skipped
 
 async def get_account_info(api_id, api_hash, session_string):
     try:
@@ -565,61 +941,43 @@ async def join_group_by_link(account_id, invite_link):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
         hash_pattern = re.compile(r'(?:https?://)?(?:t\.me|telegram\.me)/(?:joinchat/|\+)([a-zA-Z0-9_-]+)')
         username_pattern = re.compile(r'(?:https?://)?(?:t\.me|telegram\.me)/([a-zA-Z][a-zA-Z0-9_]{4,})')
         
         hash_match = hash_pattern.search(invite_link)
         username_match = username_pattern.search(invite_link)
         
+        if not hash_match and not username_match:
+            return {"success": False, "error": "Invalid invite link format"}
+        
         group_title = None
         group_id = None
         
-        if hash_match:
-            invite_hash = hash_match.group(1)
-            try:
-                result = await client(ImportChatInviteRequest(invite_hash))
-                if hasattr(result, 'chats') and result.chats:
-                    chat = result.chats[0]
-                    group_title = getattr(chat, 'title', None)
-                    group_id = chat.id
-            except UserAlreadyParticipantError:
-                await client.disconnect()
-                return {"success": False, "error": "Already a member of this group"}
-            except (InviteHashExpiredError, InviteHashInvalidError):
-                await client.disconnect()
-                return {"success": False, "error": "Invalid or expired invite link"}
-        elif username_match:
-            username = username_match.group(1)
-            try:
-                entity = await client.get_entity(username)
-                await client(JoinChannelRequest(entity))
-                group_title = getattr(entity, 'title', None)
-                group_id = entity.id
-            except UserAlreadyParticipantError:
-                await client.disconnect()
-                return {"success": False, "error": "Already a member of this group"}
-        else:
-            await client.disconnect()
-            return {"success": False, "error": "Invalid invite link format"}
-        
-        await client.disconnect()
+        async with account_client(account_id) as client:
+            if hash_match:
+                invite_hash = hash_match.group(1)
+                try:
+                    result = await client(ImportChatInviteRequest(invite_hash))
+                    if hasattr(result, 'chats') and result.chats:
+                        chat = result.chats[0]
+                        group_title = getattr(chat, 'title', None)
+                        group_id = chat.id
+                except UserAlreadyParticipantError:
+                    return {"success": False, "error": "Already a member of this group"}
+                except (InviteHashExpiredError, InviteHashInvalidError):
+                    return {"success": False, "error": "Invalid or expired invite link"}
+            else:
+                username = username_match.group(1)
+                try:
+                    entity = await client.get_entity(username)
+                    await client(JoinChannelRequest(entity))
+                    group_title = getattr(entity, 'title', None)
+                    group_id = entity.id
+                except UserAlreadyParticipantError:
+                    return {"success": False, "error": "Already a member of this group"}
         
         await database.log_group_join(account_id, group_id, group_title, invite_link)
+        await database.invalidate_group_catalog(account_id)
         await database.increment_stats(account_id, "groups_joined")
         
         return {"success": True, "group_title": group_title, "group_id": group_id}
@@ -632,27 +990,15 @@ async def send_auto_reply(account_id, to_user_id, reply_text):
         if isinstance(account_id, str):
             account_id = int(account_id)
         
-        already_replied = await database.has_replied_to_user(account_id, to_user_id)
-        if already_replied:
+        if not await database.claim_replied_user(account_id, to_user_id):
             return {"success": False, "error": "Already replied to this user"}
         
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            return {"success": False, "error": "Account not logged in"}
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
-        client = TelegramClient(StringSession(session_string), api_id, api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            return {"success": False, "error": "Session expired"}
-        
-        await client.send_message(to_user_id, reply_text)
-        await client.disconnect()
+        try:
+            async with account_client(account_id) as client:
+                await client.send_message(to_user_id, reply_text)
+        except Exception:
+            database.release_replied_user(account_id, to_user_id)
+            raise
         
         await database.mark_user_replied(account_id, to_user_id)
         await database.increment_stats(account_id, "auto_replies_sent")
@@ -691,76 +1037,122 @@ async def apply_profile_changes(api_id, api_hash, session_string):
         logger.error(f"Error applying profile changes: {e}")
         return {"success": False, "error": str(e)}
 
+async def _supervise_listener(listener, ready):
+    account_id = listener["account_id"]
+    backoff = config.LISTENER_RESTART_MIN_DELAY
+    
+    async def handle_new_message(event):
+        try:
+            if event.is_private and not event.message.out:
+                sender = await event.get_sender()
+                if sender and not sender.bot:
+                    sender_id = sender.id
+                    sender_username = sender.username
+                    
+                    if await database.claim_replied_user(account_id, sender_id):
+                        try:
+                            await event.respond(listener["reply_text"])
+                        except Exception:
+                            database.release_replied_user(account_id, sender_id)
+                            raise
+                        await database.mark_user_replied(account_id, sender_id, sender_username)
+                        await database.log_auto_reply(account_id, sender_id, sender_username)
+                        await database.increment_stats(account_id, "auto_replies_sent")
+                        logger.info(f"Auto-replied to user {sender_id} from account {account_id}")
+        except Exception as e:
+            logger.error(f"Error in auto-reply handler: {e}")
+    
+    try:
+        try:
+            await database.load_replied_index(account_id)
+        except Exception as e:
+            logger.warning(f"Could not preload replied users for account {account_id}: {e}")
+        
+        while True:
+            try:
+                async with account_client(account_id) as client:
+                    client.add_event_handler(handle_new_message, events.NewMessage(incoming=True))
+                    _set_pinned(account_id, True)
+                listener.update(client=client, status="running", started_at=time.time())
+                if not ready.done():
+                    ready.set_result(True)
+                logger.info(f"Auto-reply listener running for account {account_id}")
+                
+                await client.disconnected
+                raise ConnectionError("client disconnected")
+            except AccountUnavailableError as e:
+                listener.update(status="failed", started_at=None, last_error=str(e))
+                logger.warning(f"Auto-reply listener for account {account_id} stopped: {e}")
+                if not ready.done():
+                    ready.set_result(False)
+                return
+            except Exception as e:
+                if listener["client"] is not None:
+                    listener["client"].remove_event_handler(handle_new_message)
+                    listener["client"] = None
+                if listener["started_at"] and time.time() - listener["started_at"] >= config.LISTENER_STABLE_AFTER:
+                    backoff = config.LISTENER_RESTART_MIN_DELAY
+                listener.update(status="restarting", started_at=None, last_error=str(e), restarts=listener["restarts"] + 1)
+                if not ready.done():
+                    ready.set_result(True)
+                logger.warning(f"Auto-reply listener for account {account_id} failed ({e}), restarting in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, config.LISTENER_RESTART_MAX_DELAY)
+    finally:
+        if not ready.done():
+            ready.set_result(False)
+        if listener["client"] is not None:
+            listener["client"].remove_event_handler(handle_new_message)
+            listener["client"] = None
+        _set_pinned(account_id, False)
+        if listener["status"] == "failed" and active_clients.get(str(account_id)) is listener:
+            del active_clients[str(account_id)]
+
 async def start_auto_reply_listener(account_id, user_id, reply_text):
     try:
         if isinstance(account_id, str):
             account_id = int(account_id)
         
-        account = await database.get_account(account_id)
-        if not account or not account.get('is_logged_in'):
-            logger.warning(f"Cannot start auto-reply for account {account_id}: not logged in")
-            return False
-        
-        api_id = decrypt_data(account.get('api_id', ''))
-        api_hash = decrypt_data(account.get('api_hash', ''))
-        session_string = decrypt_data(account.get('session_string', ''))
-        
         client_key = str(account_id)
         
         if client_key in active_clients:
+            active_clients[client_key].update(user_id=user_id, reply_text=reply_text)
             logger.info(f"Auto-reply listener already running for account {account_id}")
             return True
         
-        client = TelegramClient(StringSession(session_string), int(api_id), api_hash)
-        await client.connect()
-        
-        if not await client.is_user_authorized():
-            await client.disconnect()
-            logger.warning(f"Session expired for account {account_id}")
-            return False
-        
-        @client.on(events.NewMessage(incoming=True))
-        async def handle_new_message(event):
-            try:
-                if event.is_private and not event.message.out:
-                    sender = await event.get_sender()
-                    if sender and not sender.bot:
-                        sender_id = sender.id
-                        sender_username = sender.username
-                        
-                        already_replied = await database.has_replied_to_user(account_id, sender_id)
-                        if not already_replied:
-                            await event.respond(reply_text)
-                            await database.mark_user_replied(account_id, sender_id, sender_username)
-                            await database.log_auto_reply(account_id, sender_id, sender_username)
-                            await database.increment_stats(account_id, "auto_replies_sent")
-                            logger.info(f"Auto-replied to user {sender_id} from account {account_id}")
-            except Exception as e:
-                logger.error(f"Error in auto-reply handler: {e}")
-        
-        active_clients[client_key] = {
-            "client": client,
+        listener = {
+            "client": None,
+            "task": None,
             "user_id": user_id,
-            "account_id": account_id
+            "account_id": account_id,
+            "reply_text": reply_text,
+            "status": "starting",
+            "started_at": None,
+            "restarts": 0,
+            "last_error": None
         }
+        active_clients[client_key] = listener
         
-        asyncio.create_task(client.run_until_disconnected())
-        logger.info(f"Started auto-reply listener for account {account_id}")
-        return True
+        ready = asyncio.get_running_loop().create_future()
+        listener["task"] = asyncio.create_task(_supervise_listener(listener, ready))
+        listener["task"].add_done_callback(lambda task: ready.done() or ready.set_result(False))
+        return await ready
         
     except Exception as e:
         logger.error(f"Error starting auto-reply listener: {e}")
         return False
 
+async def _stop_listeners(listeners):
+    for listener in listeners:
+        listener["task"].cancel()
+    await asyncio.gather(*(listener["task"] for listener in listeners), return_exceptions=True)
+
 async def stop_auto_reply_listener(account_id):
     try:
-        client_key = str(account_id)
+        listener = active_clients.pop(str(account_id), None)
         
-        if client_key in active_clients:
-            client_data = active_clients[client_key]
-            client = client_data["client"]
-            await client.disconnect()
-            del active_clients[client_key]
+        if listener is not None:
+            await _stop_listeners([listener])
             logger.info(f"Stopped auto-reply listener for account {account_id}")
             return True
         return False
@@ -787,22 +1179,45 @@ async def start_all_auto_reply_listeners(user_id, reply_text):
 
 async def stop_all_auto_reply_listeners(user_id):
     try:
-        stopped = 0
-        to_remove = []
+        to_remove = [client_key for client_key, listener in active_clients.items() if listener.get("user_id") == user_id]
+        listeners = [active_clients.pop(client_key) for client_key in to_remove]
+        await _stop_listeners(listeners)
         
-        for client_key, client_data in active_clients.items():
-            if client_data.get("user_id") == user_id:
-                to_remove.append(client_key)
-        
-        for client_key in to_remove:
-            client_data = active_clients[client_key]
-            client = client_data["client"]
-            await client.disconnect()
-            del active_clients[client_key]
-            stopped += 1
-        
-        logger.info(f"Stopped auto-reply for {stopped} accounts for user {user_id}")
-        return stopped
+        logger.info(f"Stopped auto-reply for {len(listeners)} accounts for user {user_id}")
+        return len(listeners)
     except Exception as e:
         logger.error(f"Error stopping all auto-reply listeners: {e}")
         return 0
+
+async def restore_auto_reply_listeners():
+    semaphore = asyncio.Semaphore(config.LISTENER_RESTORE_CONCURRENCY)
+    
+    async def restore(account_id, user_id, reply_text):
+        async with semaphore:
+            return await start_auto_reply_listener(account_id, user_id, reply_text)
+    
+    jobs = []
+    for user in await database.get_auto_reply_users():
+        reply_text = user.get("auto_reply_text") or config.AUTO_REPLY_TEXT
+        for account in await database.get_accounts(user["user_id"], logged_in_only=True):
+            jobs.append(restore(account["_id"], user["user_id"], reply_text))
+    
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    restored = sum(1 for result in results if result is True)
+    logger.info(f"Restored {restored}/{len(jobs)} auto-reply listeners")
+    return restored
+
+def get_listener_health(user_id=None):
+    now = time.time()
+    return [
+        {
+            "account_id": listener["account_id"],
+            "user_id": listener["user_id"],
+            "status": listener["status"],
+            "uptime": now - listener["started_at"] if listener["started_at"] else 0,
+            "restarts": listener["restarts"],
+            "last_error": listener["last_error"]
+        }
+        for listener in active_clients.values()
+        if user_id is None or listener["user_id"] == user_id
+    ]
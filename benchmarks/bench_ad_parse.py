@@ -0,0 +1,41 @@
+# Per-send parse cost of an HTML ad: html.parse on every send vs the cached compile_message.
+# Run from the repo root: python benchmarks/bench_ad_parse.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telethon.extensions import html
+from PyToday.telethon_handler import compile_message
+
+RUNS = 2000
+LENGTHS = [200, 1000, 4000]
+BLOCK = (
+    "<b>🔥 Big sale today!</b> Get <i>premium</i> accounts at the "
+    "<a href=\"https://example.com/shop\">best prices</a>. "
+    "<blockquote>Fast delivery, 24/7 support</blockquote> "
+    "Contact <code>@seller</code> now. "
+)
+
+def make_ad(length):
+    ad = ""
+    while len(html.parse(ad)[0]) < length:
+        ad += BLOCK
+    return ad
+
+def per_call_us(func, text):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        func(text)
+    return (time.perf_counter() - started) * 1_000_000 / RUNS
+
+def main():
+    print(f"average of {RUNS} runs, us per send")
+    for length in LENGTHS:
+        ad = make_ad(length)
+        compile_message(ad)
+        print(f"{length:>5} chars: html.parse {per_call_us(html.parse, ad):>7.0f} us   cached {per_call_us(compile_message, ad):>5.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Peak memory and time of a group catalog sync over synthetic dialog pages:
+# the old get_dialogs list + filter against the streaming _sync_group_catalog.
+# Run from the repo root: python benchmarks/bench_dialog_pages.py [dialogs ...]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telethon.tl.types import Channel, ChatPhotoEmpty
+from PyToday import config, database, telethon_handler
+
+PAGE_SIZE = 100
+MESSAGE_SIZE = 2048
+START = datetime(2024, 1, 1)
+
+def make_dialog(i):
+    entity = Channel(
+        id=1_000_000 + i, title=f"Group {i}", photo=ChatPhotoEmpty(), date=START,
+        access_hash=i, megagroup=i % 4 != 0, broadcast=i % 4 == 0, participants_count=i
+    )
+    message = SimpleNamespace(message=f"{i:08d}".ljust(MESSAGE_SIZE, "x"), date=START - timedelta(seconds=i))
+    return SimpleNamespace(entity=entity, title=entity.title, date=message.date, pinned=False, message=message)
+
+class SyntheticClient:
+    def __init__(self, total):
+        self.total = total
+    
+    async def iter_dialogs(self, limit=None, ignore_migrated=False):
+        for offset in range(0, self.total, PAGE_SIZE):
+            page = [make_dialog(i) for i in range(offset, min(offset + PAGE_SIZE, self.total))]
+            await asyncio.sleep(0)
+            for dialog in page:
+                yield dialog
+    
+    async def get_dialogs(self, limit=None):
+        return [dialog async for dialog in self.iter_dialogs(limit)]
+
+async def list_and_filter(client):
+    records = []
+    for dialog in await client.get_dialogs(limit=client.total):
+        record = telethon_handler._dialog_record(dialog)
+        if record is not None:
+            records.append(record)
+    return records
+
+async def measure(coro):
+    tracemalloc.start()
+    started = time.perf_counter()
+    await coro
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return peak, elapsed
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 5_000, 20_000]
+    config.MONGODB_URI = None
+    with tempfile.TemporaryDirectory() as tmp:
+        database.sqlite_db_path = os.path.join(tmp, "bench.db")
+        await database.init_db()
+        print(f"pages of {PAGE_SIZE} dialogs, {MESSAGE_SIZE} byte last messages, 3 in 4 megagroups")
+        print(f"{'dialogs':>8}  {'get_dialogs list + filter':>26}  {'streaming + chunked upsert':>27}")
+        for account_id, total in enumerate(sizes, start=1):
+            client = SyntheticClient(total)
+            
+            @asynccontextmanager
+            async def account_client(account_id):
+                yield client
+            
+            telethon_handler.account_client = account_client
+            old_peak, old_ms = await measure(list_and_filter(client))
+            new_peak, new_ms = await measure(telethon_handler._sync_group_catalog(account_id))
+            print(f"{total:>8,}  {old_peak:>8.1f} MiB {old_ms:>7.0f} ms  {new_peak:>11.1f} MiB {new_ms:>7.0f} ms")
+        await database.close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
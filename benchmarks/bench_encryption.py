@@ -0,0 +1,31 @@
+# Cost per decrypt_data call: PBKDF2 derivation per call (old) vs the cached MultiFernet.
+# Run from the repo root: python benchmarks/bench_encryption.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from PyToday import config
+from PyToday.encryption import decrypt_data, derive_key, encrypt_data
+
+RUNS = 200
+
+def decrypt_uncached(token):
+    return Fernet(derive_key.__wrapped__(config.ENCRYPTION_KEY)).decrypt(token.encode()).decode()
+
+def per_call_ms(func, token):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        func(token)
+    return (time.perf_counter() - started) * 1000 / RUNS
+
+def main():
+    token = encrypt_data("x" * 220)
+    print(f"token: {len(token)} bytes, {RUNS} decrypts")
+    print(f"derive per call: {per_call_ms(decrypt_uncached, token):.3f} ms")
+    print(f"cached cipher:   {per_call_ms(decrypt_data, token):.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Lookup latency on dm_replied_users / auto_reply_logs before and after the migration 1 indexes.
+# Run from the repo root: python benchmarks/bench_indexes.py [rows ...]
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyToday.database import MIGRATIONS
+
+ACCOUNTS = 50
+QUERIES = 200
+INDEXES = [
+    statement for statement in dict(MIGRATIONS)[1]
+    if statement.startswith("CREATE") and ("dm_replied_users" in statement or "auto_reply_logs" in statement)
+]
+
+def build(path, rows):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE dm_replied_users (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, user_id INTEGER, username TEXT, replied_at TEXT)")
+    db.execute("CREATE TABLE auto_reply_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, from_user_id INTEGER, from_username TEXT, created_at TEXT)")
+    replied = ((i % ACCOUNTS, i, f"user{i}", "2024-01-01T00:00:00") for i in range(rows))
+    db.executemany("INSERT INTO dm_replied_users (account_id, user_id, username, replied_at) VALUES (?, ?, ?, ?)", replied)
+    logs = ((i % ACCOUNTS, i, f"user{i}", "2024-01-01T00:00:00") for i in range(rows))
+    db.executemany("INSERT INTO auto_reply_logs (account_id, from_user_id, from_username, created_at) VALUES (?, ?, ?, ?)", logs)
+    db.commit()
+    return db
+
+def per_query_ms(db, sql, params):
+    started = time.perf_counter()
+    for args in params:
+        db.execute(sql, args).fetchall()
+    return (time.perf_counter() - started) * 1000 / len(params)
+
+def measure(db, rows):
+    lookups = [(user_id % ACCOUNTS, user_id) for user_id in random.sample(range(rows), QUERIES)]
+    counts = [(account_id % ACCOUNTS,) for account_id in range(QUERIES)]
+    return (
+        per_query_ms(db, "SELECT 1 FROM dm_replied_users WHERE account_id = ? AND user_id = ?", lookups),
+        per_query_ms(db, "SELECT COUNT(*) FROM auto_reply_logs WHERE account_id = ?", counts)
+    )
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{ACCOUNTS} accounts, {QUERIES} queries, ms per query")
+    print(f"{'rows':>9}  {'has_replied_to_user':>22}  {'COUNT(*) per account':>22}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = build(os.path.join(tmp, "bench.db"), rows)
+            lookup_before, count_before = measure(db, rows)
+            for statement in INDEXES:
+                db.execute(statement)
+            db.execute("ANALYZE")
+            lookup_after, count_after = measure(db, rows)
+            db.close()
+        print(f"{rows:>9,}  {lookup_before:>9.3f} -> {lookup_after:<9.3f}  {count_before:>9.3f} -> {count_after:.3f}")
+
+if __name__ == "__main__":
+    main()
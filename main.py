@@ -5,8 +5,11 @@ import sys
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 from telegram.error import NetworkError, TimedOut, RetryAfter, TelegramError
 from PyToday import database
-from PyToday.handlers import start_command, handle_callback, handle_message, broadcast_command
+from PyToday.handlers import start_command, handle_callback, handle_message, handle_media_message, broadcast_command, health_command, keywords_command
 from PyToday import config
+from PyToday.encryption import init_cipher
+from PyToday.telethon_handler import close_client_pool, restore_auto_reply_listeners
+from PyToday.campaigns import close_scheduler, restore_campaigns
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -42,8 +45,20 @@ async def error_handler(update, context):
         logger.error(f"Unexpected error: {e}", exc_info=True)
 
 async def post_init(application):
+    await init_cipher()
     await database.init_db()
     logger.info("✅ Database initialized successfully")
+    if config.ENCRYPTION_OLD_KEYS:
+        rotated = await database.rotate_account_secrets()
+        logger.info(f"Re-encrypted {rotated} accounts with the current encryption key")
+    application.create_task(restore_auto_reply_listeners())
+    application.create_task(restore_campaigns())
+
+async def post_shutdown(application):
+    await close_scheduler()
+    await close_client_pool()
+    await database.close_db()
+    logger.info("Database connections closed")
 
 async def keep_alive():
     while True:
@@ -71,6 +86,7 @@ def main():
         Application.builder()
         .token(config.BOT_TOKEN)
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .read_timeout(30)
         .write_timeout(30)
         .connect_timeout(30)
@@ -81,8 +97,11 @@ def main():
     
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("broadcast", broadcast_command))
+    application.add_handler(CommandHandler("health", health_command))
+    application.add_handler(CommandHandler("keywords", keywords_command))
     application.add_handler(CallbackQueryHandler(handle_callback))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application.add_handler(MessageHandler(filters.PHOTO | filters.VIDEO | filters.Document.ALL, handle_media_message))
     
     application.add_error_handler(error_handler)
     